@@ -1,9 +1,13 @@
 # app.py
 import threading
 from flask import Flask
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room
 from data import repository_firebase as repository  
-from presentation.views.web_view import web_bp
+from presentation.views.web_view import web_bp, ADMIN_TOKEN
+from core.events import init_events, emit_event, district_room
+from core.serialization import SocketJSON
+from core.hotspot_service import start_hotspot_detector
+from core.search_service import start_search_index
 from presentation.presenters.bot_presenter import create_bot_app
 import asyncio
 
@@ -11,19 +15,31 @@ import asyncio
 # ⚙️ Flask + SocketIO
 # ==========================
 app = Flask(__name__, template_folder="ui/templates")
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading", json=SocketJSON)
 
 # Registrar blueprint web
 app.register_blueprint(web_bp)
 
-# Vincular eventos entre capa de datos y socket.io
-def _emit_event(name, payload):
-    try:
-        socketio.emit(name, payload)
-    except Exception as e:
-        print("⚠️ Emit error:", e)
+# Vincular eventos entre capa de datos y socket.io (por sala de distrito)
+init_events(socketio)
+repository.set_emit_callback(emit_event)
 
-repository.set_emit_callback(_emit_event)
+# Detector de zonas calientes (escucha 'new_incident' y emite 'hotspot_alert')
+start_hotspot_detector()
+
+# Índice de búsqueda de texto completo (se mantiene con new_incident / update_incident)
+start_search_index()
+
+
+# Los paneles admin se unen a la sala de su distrito (o a la global)
+@socketio.on("join")
+def _join_district(data):
+    data = data or {}
+    if data.get("token") != ADMIN_TOKEN:
+        return False
+    room = district_room(data.get("district"))
+    join_room(room)
+    return room
 
 # ==========================
 # 🤖 Integración Telegram + Flask
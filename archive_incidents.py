@@ -0,0 +1,35 @@
+# archive_incidents.py
+"""
+Tiering de incidentes: mueve los incidentes que llevan tiempo resueltos (según
+`resolved_at`) desde `incidents` (conjunto activo) a particiones mensuales
+`incidents_archive/{yyyy-mm}` (mes de creación).
+
+Uso:
+    python archive_incidents.py              # usa ARCHIVE_AFTER_DAYS (180 por defecto)
+    python archive_incidents.py --days 365
+
+Pensado para ejecutarse periódicamente (cron). Las lecturas del mapa y del panel
+solo consultan el conjunto activo; las estadísticas y la exportación incluyen el
+archivo cuando el rango pedido lo cubre.
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+from data import repository_firebase as repository
+
+load_dotenv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archiva incidentes resueltos antiguos.")
+    parser.add_argument("--days", type=int, default=int(os.getenv("ARCHIVE_AFTER_DAYS", "180")),
+                        help="Días que debe llevar resuelto un incidente para archivarlo")
+    args = parser.parse_args()
+
+    moved = repository.archive_resolved_incidents(args.days)
+    print(f"✅ Archivado completo: {sum(moved.values())} incidentes en {len(moved)} particiones.")
+
+    # Estado del archivo tras la pasada (resumen acumulado de cada partición)
+    for month_key, summary in sorted(repository.get_archive_summaries().items()):
+        print(f"   {month_key}: {summary.get('count', 0)} incidentes archivados")
@@ -0,0 +1,85 @@
+# core/alert_service.py
+import threading
+from collections import OrderedDict
+from telegram.helpers import escape_markdown
+from data import repository_firebase as repository
+from core.notifier import get_sender
+from core.spatial_index import GridIndex
+
+# Categorías que disparan alertas a los vecinos cercanos
+ALERT_CATEGORIES = {"Robo", "Emergencia"}
+RADIUS_OPTIONS_M = (500, 1000, 2000)
+_DEDUP_MAX = 10000
+
+_index = None
+_index_lock = threading.Lock()
+_alerted = OrderedDict()
+_alerted_lock = threading.Lock()
+
+
+def _get_index():
+    """Carga perezosa del índice espacial de suscriptores desde Firestore."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = GridIndex()
+            for sub in repository.get_alert_subscribers():
+                try:
+                    index.upsert(int(sub["telegram_id"]), float(sub["alert_lat"]),
+                                 float(sub["alert_lon"]), float(sub["alert_radius_m"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            _index = index
+            print(f"🔔 Índice de alertas cargado: {len(index)} suscriptores")
+        return _index
+
+
+# ============================================================
+# 🔹 Suscripción de vecinos
+# ============================================================
+def subscribe_alerts(telegram_id, lat, lon, radius_m):
+    """Activa (radius_m > 0) o desactiva (radius_m = 0) las alertas cercanas de un usuario."""
+    repository.set_alert_subscription(telegram_id, lat, lon, radius_m)
+    index = _get_index()
+    if radius_m > 0:
+        index.upsert(int(telegram_id), float(lat), float(lon), float(radius_m))
+    else:
+        index.remove(int(telegram_id))
+
+
+# ============================================================
+# 🔹 Difusión de un incidente a los vecinos
+# ============================================================
+def _first_alert(incident_id):
+    """True solo la primera vez que se alerta sobre un incidente."""
+    with _alerted_lock:
+        if incident_id in _alerted:
+            return False
+        _alerted[incident_id] = True
+        if len(_alerted) > _DEDUP_MAX:
+            _alerted.popitem(last=False)
+        return True
+
+
+def notify_nearby(incident):
+    """Avisa a los vecinos suscritos cuyo radio cubre el incidente. Retorna el Future del envío o None."""
+    if not incident or incident.get("category") not in ALERT_CATEGORIES:
+        return None
+    lat, lon = incident.get("lat"), incident.get("lon")
+    if lat is None or lon is None or not _first_alert(incident.get("id")):
+        return None
+
+    reporter = str(incident.get("user_id"))
+    targets = [uid for uid in _get_index().query(float(lat), float(lon)) if str(uid) != reporter]
+    if not targets:
+        return None
+
+    # Dirección y descripción son texto libre: escapadas, y sin itálica alrededor
+    # (el Markdown de Telegram no admite escapes dentro de una entidad)
+    text = (
+        f"🚨 *Alerta vecinal: {escape_markdown(incident['category'])}*\n\n"
+        f"📍 {escape_markdown(incident.get('address') or 'Ubicación no disponible')}\n"
+        f"📝 {escape_markdown(incident.get('message') or 'Sin descripción')}"
+    )
+    print(f"🔔 Alertando a {len(targets)} vecinos sobre el incidente {incident.get('id')}")
+    return get_sender().broadcast(targets, text, parse_mode="Markdown")
@@ -0,0 +1,135 @@
+# core/circuit_breaker.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito de una dependencia está abierto: se falla rápido sin llamarla."""
+
+    def __init__(self, name):
+        super().__init__(f"Circuito '{name}' abierto")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por dependencia externa (Firestore, Mapbox...).
+    - closed: las llamadas pasan; `failure_threshold` fallos seguidos lo abren.
+    - open: las llamadas fallan al instante con CircuitOpenError durante `reset_timeout` s.
+    - half_open: se deja pasar una única llamada de prueba; si va bien se cierra, si no vuelve a abrirse.
+    Cada llamada se ejecuta en un pool propio con `call_timeout`, para que el hilo
+    de la petición no quede bloqueado aunque la dependencia no responda. El pool no
+    puede interrumpir un hilo ya en marcha: la función llamada debe pasar también su
+    propio timeout al SDK (Firestore `timeout=`, requests `timeout=`) para liberar el
+    worker. El `call_timeout` se cuenta desde que la llamada empieza a ejecutarse; si
+    ni siquiera sale de la cola del pool a tiempo se descarta sin contarla como fallo
+    de la dependencia (es saturación propia, no de Firestore/Mapbox).
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, call_timeout=5.0, max_workers=8):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"cb-{name}")
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(self.name)
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.name)
+                self._probing = True
+
+    def _on_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"🔌 Circuito '{self.name}' abierto tras {self.failures} fallos")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def _release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def call(self, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) protegida por el breaker y con timeout."""
+        self._before_call()
+        started = threading.Event()
+
+        def run():
+            started.set()
+            return fn(*args, **kwargs)
+
+        future = self._pool.submit(run)
+        if not started.wait(self.call_timeout) and future.cancel():
+            # Nunca llegó a ejecutarse: el pool está saturado, la dependencia no tiene la culpa
+            self._release_probe()
+            raise TimeoutError(f"'{self.name}': sin workers libres en {self.call_timeout}s")
+        try:
+            result = future.result(timeout=self.call_timeout)
+        except FutureTimeout:
+            self._on_failure()
+            raise TimeoutError(f"'{self.name}' no respondió en {self.call_timeout}s")
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+BREAKERS = {
+    "firestore": CircuitBreaker(
+        "firestore",
+        call_timeout=float(os.getenv("FIRESTORE_TIMEOUT", "5")),
+        reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+    ),
+    "mapbox": CircuitBreaker(
+        "mapbox",
+        call_timeout=float(os.getenv("MAPBOX_TIMEOUT", "3")),
+        reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+    ),
+}
+
+
+def get_breaker(name):
+    return BREAKERS[name]
+
+
+def breaker_states():
+    """Estado de todos los breakers: {'firestore': {'state': 'closed', 'failures': 0}, ...}"""
+    return {name: b.snapshot() for name, b in BREAKERS.items()}
+
+
+def any_open():
+    return any(b.is_open for b in BREAKERS.values())
@@ -0,0 +1,64 @@
+# core/dedup_service.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from data import repository_firebase as repository
+from core.spatial_index import RecentIndex
+
+load_dotenv()
+
+# Mismo hecho = misma categoría, a menos de N metros y M minutos
+DEDUP_RADIUS_M = float(os.getenv("DEDUP_RADIUS_M", "150"))
+DEDUP_WINDOW_MIN = float(os.getenv("DEDUP_WINDOW_MIN", "30"))
+
+_index = None
+_index_lock = threading.Lock()
+# Locks por zona: dos reportes simultáneos del mismo hecho no crean dos incidentes
+_stripes = [threading.Lock() for _ in range(64)]
+
+
+def _get_index():
+    """Carga perezosa: los incidentes abiertos de la ventana actual."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = RecentIndex(DEDUP_RADIUS_M, DEDUP_WINDOW_MIN * 60)
+            since = datetime.now(timezone.utc) - timedelta(minutes=DEDUP_WINDOW_MIN)
+            try:
+                recent = repository.get_incident_models_in_range(since, include_archive=False)
+            except Exception as e:
+                print("⚠️ No se pudo precargar el índice de duplicados:", e)
+                recent = []
+            for inc in reversed(recent):  # del más antiguo al más reciente
+                if inc.status == "open" and inc.has_location and inc.created_at:
+                    index.add(inc.id, inc.raw_category, inc.lat, inc.lon, inc.created_at.timestamp())
+            _index = index
+        return _index
+
+
+def intake_lock(category, lat, lon):
+    """Lock de la zona del reporte (se comparte entre zonas por hash, sin crecer)."""
+    if lat is None or lon is None:
+        return _stripes[0]
+    _, cy, cx = _get_index()._cell(category, float(lat), float(lon))
+    # Agrupa celdas de 2x2 para que vecinos en el borde de una celda compartan lock casi siempre
+    return _stripes[hash((category, cy // 2, cx // 2)) % len(_stripes)]
+
+
+def find_duplicate(category, lat, lon):
+    """ID de un incidente abierto equivalente, o None."""
+    if lat is None or lon is None or not category:
+        return None
+    return _get_index().find(category, float(lat), float(lon), time.time())
+
+
+def remember(incident):
+    if incident.get("lat") is None or incident.get("lon") is None:
+        return
+    _get_index().add(incident["id"], incident.get("category"), float(incident["lat"]), float(incident["lon"]), time.time())
+
+
+def forget(incident_id):
+    _get_index().remove(incident_id)
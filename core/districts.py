@@ -0,0 +1,112 @@
+# core/districts.py
+"""
+Jurisdicciones (distritos policiales) configuradas como GeoJSON en DISTRICTS_FILE:
+un FeatureCollection de Polygon/MultiPolygon con `properties.id` y `properties.name`.
+Sin archivo configurado todo funciona como antes (incidentes sin distrito).
+"""
+import json
+import math
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DISTRICTS_FILE = os.getenv("DISTRICTS_FILE", "")
+CELL_DEG = 0.02
+
+
+def _point_in_ring(lat, lon, ring):
+    """Ray casting sobre un anillo [[lon, lat], ...]."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _point_in_polygon(lat, lon, polygon):
+    """Polígono GeoJSON: primer anillo exterior, el resto agujeros."""
+    if not _point_in_ring(lat, lon, polygon[0]):
+        return False
+    return not any(_point_in_ring(lat, lon, hole) for hole in polygon[1:])
+
+
+class DistrictIndex:
+    """
+    Búsqueda punto-en-polígono con índice en rejilla: cada celda guarda solo los
+    polígonos cuyo bounding box la toca, así cada consulta evalúa muy pocos polígonos.
+    """
+
+    def __init__(self, features, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.districts = {}
+        self._cells = {}
+        for feat in features:
+            props = feat.get("properties") or {}
+            district_id = str(props.get("id") or props.get("name"))
+            self.districts[district_id] = props.get("name") or district_id
+
+            geom = feat.get("geometry") or {}
+            polygons = geom.get("coordinates", [])
+            if geom.get("type") == "Polygon":
+                polygons = [polygons]
+            for polygon in polygons:
+                lons = [p[0] for p in polygon[0]]
+                lats = [p[1] for p in polygon[0]]
+                bbox = (min(lats), min(lons), max(lats), max(lons))
+                entry = (district_id, bbox, polygon)
+                for cy in range(self._c(bbox[0]), self._c(bbox[2]) + 1):
+                    for cx in range(self._c(bbox[1]), self._c(bbox[3]) + 1):
+                        self._cells.setdefault((cy, cx), []).append(entry)
+
+    def _c(self, v):
+        return math.floor(v / self.cell_deg)
+
+    def locate(self, lat, lon):
+        """ID del distrito que contiene el punto, o None."""
+        for district_id, (min_lat, min_lon, max_lat, max_lon), polygon in self._cells.get((self._c(lat), self._c(lon)), ()):
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon and _point_in_polygon(lat, lon, polygon):
+                return district_id
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_district_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            features = []
+            if DISTRICTS_FILE:
+                try:
+                    with open(DISTRICTS_FILE, encoding="utf-8") as f:
+                        features = json.load(f).get("features", [])
+                    print(f"🗺️ {len(features)} distritos cargados desde {DISTRICTS_FILE}")
+                except Exception as e:
+                    print("⚠️ No se pudieron cargar los distritos:", e)
+            _index = DistrictIndex(features)
+        return _index
+
+
+def assign_district(lat, lon):
+    """Distrito para unas coordenadas (None si no hay distritos o está fuera de todos)."""
+    if lat is None or lon is None:
+        return None
+    return get_district_index().locate(float(lat), float(lon))
+
+
+def list_districts():
+    """[{'id': ..., 'name': ...}, ...]"""
+    return [{"id": k, "name": v} for k, v in get_district_index().districts.items()]
+
+
+def is_known_district(district_id):
+    """True si `district_id` es uno de los distritos configurados (None = todos, siempre válido)."""
+    return district_id is None or district_id in get_district_index().districts
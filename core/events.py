@@ -0,0 +1,43 @@
+# core/events.py
+"""
+Emisión de eventos Socket.IO por sala de jurisdicción.
+Cada panel admin se une a `district:<id>` (su distrito) o a `district:*` (todos),
+así un panel solo recibe los eventos de su parte de la carga.
+Los servicios internos pueden escuchar los mismos eventos con on_event().
+"""
+ALL_ROOM = "district:*"
+
+_socketio = None
+_listeners = {}
+
+
+def init_events(socketio):
+    global _socketio
+    _socketio = socketio
+
+
+def on_event(name, fn):
+    """Registra un listener local que recibe el payload de cada evento `name` emitido."""
+    _listeners.setdefault(name, []).append(fn)
+
+
+def district_room(district):
+    return f"district:{district}" if district else ALL_ROOM
+
+
+def emit_event(name, payload):
+    """Emite a la sala global y, si el payload tiene distrito, a la sala de ese distrito."""
+    for fn in _listeners.get(name, ()):
+        try:
+            fn(payload)
+        except Exception as e:
+            print(f"⚠️ Error en listener de {name}: {e}")
+    if _socketio is None:
+        return
+    try:
+        _socketio.emit(name, payload, to=ALL_ROOM)
+        district = (payload or {}).get("district")
+        if district:
+            _socketio.emit(name, payload, to=district_room(district))
+    except Exception as e:
+        print(f"⚠️ No se pudo emitir evento {name}: {e}")
@@ -1,7 +1,11 @@
 # core/geolocalizador.py
 import os
+import threading
+from collections import OrderedDict
 import requests
 from dotenv import load_dotenv
+from core.circuit_breaker import get_breaker, CircuitOpenError
+from core.profiling import span
 
 load_dotenv()
 
@@ -10,17 +14,64 @@ MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN")
 if not MAPBOX_TOKEN:
     raise ValueError("❌ No se encontró MAPBOX_TOKEN en el archivo .env")
 
+# Caché LRU de geocodificación (compartida entre la web y la importación masiva)
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "5000"))
+_geocode_cache = OrderedDict()
+_geocode_lock = threading.Lock()
+
+
+def _cache_key(q: str):
+    return " ".join(q.lower().split())
+
+
+def _fetch_json(url, params, timeout):
+    resp = requests.get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _mapbox_get(url, params):
+    """GET a Mapbox protegido por el circuit breaker 'mapbox' (falla rápido si está abierto)."""
+    breaker = get_breaker("mapbox")
+    with span("mapbox"):
+        return breaker.call(_fetch_json, url, params, breaker.call_timeout)
+
+
+def coords_address(lat: float, lon: float):
+    """Dirección de respaldo con solo coordenadas (modo degradado)."""
+    return f"{float(lat):.5f}, {float(lon):.5f}"
+
 
 def geocode_address(q: str):
     """
     Convierte una dirección textual en coordenadas usando la API de Mapbox.
+    Los resultados exitosos se guardan en una caché LRU en memoria.
     Retorna: {'lat': float, 'lon': float, 'address': str} o None si falla.
     """
+    key = _cache_key(q)
+    with _geocode_lock:
+        cached = _geocode_cache.get(key)
+        if cached is not None:
+            _geocode_cache.move_to_end(key)
+            return dict(cached)
+
+    result = _geocode_remote(q)
+    if result:
+        with _geocode_lock:
+            _geocode_cache[key] = result
+            _geocode_cache.move_to_end(key)
+            while len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+                _geocode_cache.popitem(last=False)
+        return dict(result)
+    return None
+
+
+def _geocode_remote(q: str):
+    """Consulta directa a Mapbox, sin caché."""
     try:
         url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{q}.json"
         params = {"access_token": MAPBOX_TOKEN, "limit": 1, "language": "es"}
-        resp = requests.get(url, params=params, timeout=8)
-        data = resp.json()
+        data = _mapbox_get(url, params)
 
         if not data["features"]:
             return None
@@ -30,6 +81,8 @@ def geocode_address(q: str):
         address = feat["place_name"]
         return {"lat": lat, "lon": lon, "address": address}
 
+    except CircuitOpenError:
+        return None
     except Exception as e:
         print("⚠️ Error en geocode_address:", e)
         return None
@@ -38,20 +91,22 @@ def geocode_address(q: str):
 def reverse_latlon(lat: float, lon: float):
     """
     Convierte coordenadas (lat, lon) en una dirección textual usando Mapbox.
-    Retorna: {'address': str}
+    Si Mapbox no está disponible devuelve solo las coordenadas.
+    Retorna: {'address': str, 'degraded': bool}
     """
     try:
         url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{lon},{lat}.json"
         params = {"access_token": MAPBOX_TOKEN, "language": "es"}
-        resp = requests.get(url, params=params, timeout=8)
-        data = resp.json()
+        data = _mapbox_get(url, params)
 
         if not data["features"]:
-            return {"address": "Ubicación desconocida"}
+            return {"address": "Ubicación desconocida", "degraded": False}
 
         address = data["features"][0]["place_name"]
-        return {"address": address}
+        return {"address": address, "degraded": False}
 
+    except CircuitOpenError:
+        return {"address": coords_address(lat, lon), "degraded": True}
     except Exception as e:
         print("⚠️ Error en reverse_latlon:", e)
-        return {"address": "Ubicación desconocida"}
+        return {"address": coords_address(lat, lon), "degraded": True}
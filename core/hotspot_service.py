@@ -0,0 +1,339 @@
+# core/hotspot_service.py
+"""
+Detección de zonas calientes en tiempo real.
+
+Cuenta cada reporte, tanto los incidentes nuevos como los que la deduplicación adjunta
+a uno existente (corroboraciones). Cada (categoría, celda de la rejilla) tiene un contador en anillo con cubetas de
+HOTSPOT_BUCKET_MIN minutos que cubre la ventana HOTSPOT_WINDOW_MIN. Las cubetas que
+salen de la ventana alimentan una línea base móvil (media exponencial por cubeta),
+así el pico actual no se compara consigo mismo.
+
+Una celda es zona caliente cuando su cuenta en la ventana llega a HOTSPOT_MIN_COUNT y
+a HOTSPOT_FACTOR veces lo esperado por la línea base. Al entrar en ese estado se emite
+'hotspot_alert' a los paneles; /api/hotspots sirve una instantánea ya serializada que
+se reconstruye cada HOTSPOT_REFRESH_S segundos.
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from core.events import emit_event, on_event
+from core.serialization import dumps_bytes
+
+load_dotenv()
+
+HOTSPOT_CELL_DEG = float(os.getenv("HOTSPOT_CELL_DEG", "0.005"))          # ~550 m
+HOTSPOT_WINDOW_MIN = float(os.getenv("HOTSPOT_WINDOW_MIN", "60"))
+HOTSPOT_BUCKET_MIN = float(os.getenv("HOTSPOT_BUCKET_MIN", "5"))
+HOTSPOT_MIN_COUNT = int(os.getenv("HOTSPOT_MIN_COUNT", "5"))
+HOTSPOT_FACTOR = float(os.getenv("HOTSPOT_FACTOR", "3"))
+HOTSPOT_BASELINE_HOURS = float(os.getenv("HOTSPOT_BASELINE_HOURS", "168"))
+HOTSPOT_REFRESH_S = float(os.getenv("HOTSPOT_REFRESH_S", "2"))
+WARMUP_RETRY_S = 5          # espera inicial entre intentos de precarga (se duplica hasta WARMUP_RETRY_MAX_S)
+WARMUP_RETRY_MAX_S = 300
+
+
+class _CellCounter:
+    __slots__ = ("counts", "last_bucket", "last_event", "total", "baseline", "hot", "district")
+
+    def __init__(self, buckets, bucket_no, district):
+        self.counts = [0] * buckets
+        self.last_bucket = bucket_no
+        self.last_event = bucket_no   # cubeta del último incidente contado
+        self.total = 0
+        self.baseline = 0.0     # incidentes esperados por cubeta
+        self.hot = False
+        self.district = district
+
+
+class HotspotDetector:
+    """Conteos por ventana deslizante por (categoría, celda) con línea base móvil."""
+
+    def __init__(self, cell_deg=HOTSPOT_CELL_DEG, window_min=HOTSPOT_WINDOW_MIN, bucket_min=HOTSPOT_BUCKET_MIN,
+                 min_count=HOTSPOT_MIN_COUNT, factor=HOTSPOT_FACTOR, baseline_hours=HOTSPOT_BASELINE_HOURS):
+        self.cell_deg = cell_deg
+        self.bucket_s = bucket_min * 60
+        self.buckets = max(1, round(window_min / bucket_min))
+        self.window_min = self.buckets * bucket_min
+        self.min_count = min_count
+        self.factor = factor
+        self.alpha = min(1.0, bucket_min / (baseline_hours * 60))
+        # Una celda sin incidentes durante todo el periodo de la línea base se descarta
+        self.idle_buckets = max(self.buckets, round(baseline_hours * 60 / bucket_min))
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cells)
+
+    def _advance(self, c, bucket_no):
+        gap = bucket_no - c.last_bucket
+        if gap <= 0:
+            return
+        # Las cubetas que salen de la ventana (también las vacías) actualizan la línea base
+        for k in range(1, min(gap, self.buckets) + 1):
+            i = (c.last_bucket + k) % self.buckets
+            expired = c.counts[i]
+            c.counts[i] = 0
+            c.total -= expired
+            c.baseline += self.alpha * (expired - c.baseline)
+        if gap > self.buckets:
+            c.baseline *= (1 - self.alpha) ** (gap - self.buckets)
+        c.last_bucket = bucket_no
+
+    def expected(self, c):
+        return c.baseline * self.buckets
+
+    def threshold(self, c):
+        return max(self.min_count, self.factor * self.expected(c))
+
+    def cell_center(self, cy, cx):
+        return ((cy + 0.5) * self.cell_deg, (cx + 0.5) * self.cell_deg)
+
+    def add(self, category, lat, lon, ts, district=None):
+        """Cuenta un incidente. Devuelve la clave de la celda si acaba de volverse zona caliente."""
+        key = (category, math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+        bucket_no = int(ts // self.bucket_s)
+        with self._lock:
+            c = self._cells.get(key)
+            if c is None:
+                c = self._cells[key] = _CellCounter(self.buckets, bucket_no, district)
+            self._advance(c, bucket_no)
+            if bucket_no < c.last_bucket - self.buckets + 1:
+                return None  # más viejo que la ventana
+            c.counts[bucket_no % self.buckets] += 1
+            c.total += 1
+            c.last_event = max(c.last_event, bucket_no)
+            c.district = c.district or district
+            if not c.hot and c.total >= self.threshold(c):
+                c.hot = True
+                return key
+            return None
+
+    def info(self, key):
+        with self._lock:
+            c = self._cells[key]
+            lat, lon = self.cell_center(key[1], key[2])
+            return {
+                "category": key[0], "lat": round(lat, 6), "lon": round(lon, 6),
+                "count": c.total, "expected": round(self.expected(c), 2),
+                "hot": c.hot, "district": c.district,
+            }
+
+    def tick(self, now):
+        """Avanza todas las celdas a `now`, enfría las que bajaron y descarta las inactivas (sin
+        incidentes durante todo el periodo de la línea base)."""
+        bucket_no = int(now // self.bucket_s)
+        with self._lock:
+            for key, c in list(self._cells.items()):
+                self._advance(c, bucket_no)
+                if c.hot and c.total < self.threshold(c):
+                    c.hot = False
+                if c.total == 0 and bucket_no - c.last_event > self.idle_buckets:
+                    del self._cells[key]
+
+    def heat_grid(self):
+        """Celdas con actividad en la ventana actual, de mayor a menor cuenta."""
+        with self._lock:
+            keys = [k for k, c in self._cells.items() if c.total]
+        cells = [self.info(k) for k in keys]
+        cells.sort(key=lambda c: (not c["hot"], -c["count"]))
+        return cells
+
+
+# ==========================
+# 🔌 Instancia del servicio
+# ==========================
+_detector = HotspotDetector()
+_snapshots = {}
+_empty_snapshot = dumps_bytes({"window_min": _detector.window_min, "cells": [], "generated_at": None})
+_started = False
+_start_lock = threading.Lock()
+# Reportes en vivo que llegan mientras se lee el historial: se guardan y se cuentan al
+# terminar la precarga (solo los que el historial no traía), así ni se cuentan dos
+# veces ni mueven una celda a "ahora" antes de reproducir sus eventos antiguos.
+_warming = True
+_buffered = []
+_buffer_lock = threading.Lock()
+
+
+def _incident_ts(incident):
+    created = incident.get("created_at")
+    if isinstance(created, datetime):
+        return created.timestamp()
+    return time.time()  # sin fecha utilizable
+
+
+def record_incident(incident, notify=True):
+    """
+    Listener de 'new_incident' y 'new_corroboration': suma el reporte y avisa si su
+    celda se volvió zona caliente.
+    """
+    try:
+        lat, lon = float(incident["lat"]), float(incident["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    category = incident.get("category") or "Otro"
+    key = _detector.add(category, lat, lon, _incident_ts(incident), incident.get("district"))
+    if key and notify:
+        alert = dict(_detector.info(key), window_min=_detector.window_min, incident_id=incident.get("id"))
+        print(f"🔥 Zona caliente: {alert['count']} reportes de {category} en {alert['window_min']:.0f} min "
+              f"cerca de ({alert['lat']}, {alert['lon']})")
+        emit_event("hotspot_alert", alert)
+    return key
+
+
+def _report_key(kind, report):
+    """Identidad de un reporte: el incidente por su ID; una corroboración por ID + hora."""
+    if kind == "new_incident":
+        return ("i", str(report.get("id")))
+    return ("c", str(report.get("id")), _incident_ts(report))
+
+
+def _listener(kind):
+    def listener(report):
+        with _buffer_lock:
+            if _warming:
+                _buffered.append((kind, report))
+                return
+        record_incident(report)
+    return listener
+
+
+def _rebuild_snapshots():
+    global _snapshots, _empty_snapshot
+    cells = _detector.heat_grid()
+    generated_at = datetime.now(timezone.utc).isoformat()
+    by_district = {None: cells}
+    for cell in cells:
+        if cell["district"]:
+            by_district.setdefault(cell["district"], []).append(cell)
+    _empty_snapshot = dumps_bytes({"window_min": _detector.window_min, "cells": [], "generated_at": generated_at})
+    _snapshots = {
+        d: dumps_bytes({"window_min": _detector.window_min, "cells": c, "generated_at": generated_at})
+        for d, c in by_district.items()
+    }
+
+
+def _history_events(page, since):
+    """
+    (ts, categoría, lat, lon, distrito, clave) de cada reporte: el incidente y sus
+    corroboraciones. La clave es la de _report_key, para descartar los ya vistos en vivo.
+    """
+    for inc in page:
+        try:
+            lat, lon = float(inc["lat"]), float(inc["lon"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        category = inc.get("category") or "Otro"
+        incident_id = str(inc.get("id"))
+        created = inc.get("created_at")
+        if isinstance(created, datetime) and created >= since:
+            yield created.timestamp(), category, lat, lon, inc.get("district"), ("i", incident_id)
+        for r in inc.get("corroborations") or []:
+            dt = r.get("created_at")
+            if isinstance(dt, datetime) and dt >= since:
+                ts = dt.timestamp()
+                yield ts, category, lat, lon, inc.get("district"), ("c", incident_id, ts)
+
+
+def _warm_up():
+    """
+    Reproduce el historial de la línea base para no arrancar con contadores vacíos.
+    Lee por páginas fuera del circuit breaker y solo cuenta cuando tiene el historial
+    completo, así un reintento tras un fallo no duplica incidentes. Después cuenta los
+    reportes en vivo que llegaron mientras tanto y que el historial no incluía.
+    """
+    global _warming
+    from data import repository_firebase as repository
+    delay = WARMUP_RETRY_S
+    while True:
+        since = datetime.now(timezone.utc) - timedelta(hours=HOTSPOT_BASELINE_HOURS)
+        try:
+            events = [e for page in repository.iter_incident_pages(since, include_archive=False)
+                      for e in _history_events(page, since)]
+            break
+        except Exception as e:
+            print(f"⚠️ No se pudo precargar el historial de zonas calientes (reintento en {delay:.0f}s):", e)
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+    events.sort(key=lambda e: e[0])  # del más antiguo al más reciente
+    seen = set()
+    for ts, category, lat, lon, district, key in events:
+        _detector.add(category, lat, lon, ts, district)
+        seen.add(key)
+
+    with _buffer_lock:
+        _warming = False
+        live = _buffered[:]
+        _buffered.clear()
+    fresh = [report for kind, report in live if _report_key(kind, report) not in seen]
+    for report in fresh:
+        record_incident(report)
+    print(f"🔥 Detector de zonas calientes listo: {len(events)} reportes de historial "
+          f"+ {len(fresh)} recibidos durante la carga")
+
+
+def _loop():
+    on_event("new_incident", _listener("new_incident"))
+    # Los reportes que la deduplicación adjunta a un incidente existente también cuentan
+    on_event("new_corroboration", _listener("new_corroboration"))
+    _warm_up()
+    while True:
+        try:
+            _detector.tick(time.time())
+            _rebuild_snapshots()
+        except Exception as e:
+            print("⚠️ Error actualizando zonas calientes:", e)
+        time.sleep(HOTSPOT_REFRESH_S)
+
+
+def start_hotspot_detector():
+    """Precarga el historial y mantiene la instantánea al día en un hilo de fondo."""
+    global _started
+    with _start_lock:
+        if not _started:
+            _started = True
+            threading.Thread(target=_loop, daemon=True, name="hotspots").start()
+
+
+def hotspot_snapshot(district=None):
+    """JSON ya serializado de la rejilla de calor (búsqueda en un dict, sin recalcular)."""
+    return _snapshots.get(district, _empty_snapshot)
+
+
+# === Benchmark del detector ===
+def benchmark_hotspots(n=200000):
+    import random
+
+    rnd = random.Random(38)
+    detector = HotspotDetector()
+    cats = ["Robo", "Acoso", "Vandalismo", "Emergencia", "Otro"]
+    start = time.time() - 7 * 86400
+    t0 = time.perf_counter()
+    alerts = 0
+    for i in range(n):
+        ts = start + i * (7 * 86400 / n)
+        if detector.add(rnd.choice(cats), -12.0 - rnd.random() * 0.2, -77.0 - rnd.random() * 0.2, ts):
+            alerts += 1
+    elapsed = time.perf_counter() - t0
+    # Ráfaga: 6 robos en la misma cuadra en pocos minutos
+    now = start + 7 * 86400
+    burst = [detector.add("Robo", -12.05, -77.05, now + k * 60) for k in range(6)]
+
+    t0 = time.perf_counter()
+    detector.tick(now + 360)
+    tick_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    grid = detector.heat_grid()
+    payload = dumps_bytes({"cells": grid})
+    snap_ms = (time.perf_counter() - t0) * 1000
+    print(f"{n} incidentes en {elapsed:.2f}s ({elapsed / n * 1e6:.1f} µs/incidente) | {len(detector)} celdas "
+          f"| alertas {alerts} | ráfaga detectada en el reporte #{next((k + 1 for k, b in enumerate(burst) if b), None)}")
+    print(f"tick {tick_ms:.1f} ms | instantánea {len(grid)} celdas, {len(payload) / 1e3:.0f} KB en {snap_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark_hotspots()
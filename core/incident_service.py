@@ -1,8 +1,12 @@
 from data import repository_firebase as repository
 import asyncio
+import threading
 from telegram import Bot, InlineKeyboardMarkup, InlineKeyboardButton
 import os
 from dotenv import load_dotenv
+from core.profiling import span
+from core import dedup_service
+from core.districts import assign_district
 
 load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -15,12 +19,13 @@ async def _notify_user(telegram_id, message, reply_markup=None):
     """Envía un mensaje al usuario desde el bot de Telegram."""
     try:
         bot = Bot(token=BOT_TOKEN)
-        await bot.send_message(
-            chat_id=telegram_id,
-            text=message,
-            parse_mode="Markdown",
-            reply_markup=reply_markup
-        )
+        with span("telegram"):
+            await bot.send_message(
+                chat_id=telegram_id,
+                text=message,
+                parse_mode="Markdown",
+                reply_markup=reply_markup
+            )
         print(f"✅ Mensaje enviado al usuario {telegram_id}")
     except Exception as e:
         print(f"⚠️ Error al enviar mensaje al usuario {telegram_id}: {e}")
@@ -29,19 +34,48 @@ async def _notify_user(telegram_id, message, reply_markup=None):
 # ============================================================
 # 🔹 Registrar un nuevo incidente
 # ============================================================
-def register_incident(user_id, username, message, address, lat=None, lon=None, category=None):
-    """Registra un nuevo incidente en la base de datos y emite evento de SocketIO."""
-    incident = repository.create_incident(
-        user_id, username, message, address, lat, lon, category
-    )
+def register_incident(user_id, username, message, address, lat=None, lon=None, category=None, media=None):
+    """
+    Registra un nuevo incidente en la base de datos y emite evento de SocketIO.
+    Si ya hay un incidente abierto equivalente (misma categoría, cerca y reciente),
+    el reporte se añade a ese incidente como corroboración (retorna con 'corroborated': True).
+    """
+    with dedup_service.intake_lock(category, lat, lon):
+        duplicate_id = dedup_service.find_duplicate(category, lat, lon)
+        if not duplicate_id:
+            incident = repository.create_incident(
+                user_id, username, message, address, lat, lon, category, media,
+                district=assign_district(lat, lon)
+            )
+            dedup_service.remember(incident)
+
+    if duplicate_id:
+        return corroborate_incident(duplicate_id, user_id, username, message, media)
+
+    # create_incident ya emitió 'new_incident' (callback del repositorio).
+    # Las alertas van en segundo plano: la primera llamada construye el índice
+    # de suscriptores y no debe retrasar la respuesta al que reporta.
+    threading.Thread(target=_alert_nearby, args=(incident,), daemon=True, name="alerts").start()
 
+    return incident
+
+
+def _alert_nearby(incident):
     try:
-        from app import socketio
-        socketio.emit("new_incident", incident)
+        from core.alert_service import notify_nearby
+        notify_nearby(incident)
     except Exception as e:
-        print(f"⚠️ No se pudo emitir evento new_incident: {e}")
+        print(f"⚠️ No se pudieron enviar alertas cercanas: {e}")
 
-    return incident
+
+# ============================================================
+# 🔹 Corroborar un incidente existente
+# ============================================================
+def corroborate_incident(incident_id, user_id, username, message, media=None):
+    """Adjunta un reporte duplicado al incidente original y notifica a los paneles."""
+    # add_corroboration ya emitió 'update_incident' (callback del repositorio)
+    incident = repository.add_corroboration(incident_id, user_id, username, message, media)
+    return dict(incident or {"id": incident_id}, corroborated=True)
 
 
 # ============================================================
@@ -57,16 +91,15 @@ def list_incidents():
 def mark_resolved(incident_id):
     """Marca un incidente como resuelto, notifica y pide calificación."""
     incident = repository.update_incident_status(incident_id, "resolved")
+    dedup_service.forget(incident_id)
 
+    # update_incident_status ya emitió 'update_incident' (callback del repositorio)
     if incident:
-        try:
-            from app import socketio
-            socketio.emit("update_incident", incident)
-        except Exception as e:
-            print(f"⚠️ No se pudo emitir evento update_incident: {e}")
-
-        telegram_id = incident.get("user_id")
-        if telegram_id:
+        # Reportante original + vecinos que corroboraron el mismo hecho
+        recipients = list(dict.fromkeys(
+            uid for uid in [incident.get("user_id"), *(incident.get("reporter_ids") or [])] if uid
+        ))
+        if recipients:
             try:
                 # Teclado de estrellas con ID del incidente
                 keyboard = [[
@@ -78,13 +111,16 @@ def mark_resolved(incident_id):
                 ]]
                 markup = InlineKeyboardMarkup(keyboard)
 
-                asyncio.run(_notify_user(
-                    telegram_id,
+                text = (
                     f"✅ Tu reporte #{incident['id']} ha sido *marcado como resuelto*.\n\n"
                     f"📝 Descripción: _{incident.get('message', 'Sin descripción')}_\n\n"
-                    "Por favor, califica la atención recibida:",
-                    reply_markup=markup
-                ))
+                    "Por favor, califica la atención recibida:"
+                )
+
+                async def _notify_all():
+                    await asyncio.gather(*(_notify_user(uid, text, reply_markup=markup) for uid in recipients))
+
+                asyncio.run(_notify_all())
             except Exception as e:
                 print(f"❌ Error al enviar mensaje de rating: {e}")
 
@@ -98,13 +134,8 @@ def respond_incident(incident_id, message):
     """Añade una respuesta al incidente y notifica al usuario."""
     incident = repository.set_incident_response(incident_id, message)
 
+    # set_incident_response ya emitió 'update_incident' (callback del repositorio)
     if incident:
-        try:
-            from app import socketio
-            socketio.emit("update_incident", incident)
-        except Exception as e:
-            print(f"⚠️ No se pudo emitir evento update_incident: {e}")
-
         telegram_id = incident.get("user_id")
         if telegram_id:
             asyncio.run(_notify_user(
@@ -120,12 +151,5 @@ def respond_incident(incident_id, message):
 # ============================================================
 def save_feedback_service(user_id, incident_id, rating, comment):
     """Guarda la retroalimentación del usuario asociada a su incidente."""
-    feedback = repository.save_feedback(user_id, incident_id, rating, comment)
-
-    try:
-        from app import socketio
-        socketio.emit("new_feedback", feedback)
-    except Exception as e:
-        print(f"⚠️ No se pudo emitir evento new_feedback: {e}")
-
-    return feedback
+    # save_feedback ya emitió 'new_feedback' (callback del repositorio)
+    return repository.save_feedback(user_id, incident_id, rating, comment)
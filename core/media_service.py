@@ -0,0 +1,128 @@
+# core/media_service.py
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from core.media_store import get_store
+
+try:
+    from PIL import Image
+except ImportError:  # dependencia opcional: sin Pillow no hay miniaturas
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+MAX_MEDIA_BYTES = 20 * 1024 * 1024  # límite de descarga de la Bot API
+THUMB_SIZE = (320, 320)
+MEDIA_EXTENSIONS = {"photo": "jpg", "voice": "ogg"}
+
+_pool = None
+
+
+class MediaDownloadError(Exception):
+    """Fallo al descargar un archivo de Telegram. El mensaje nunca incluye la URL (lleva el token del bot)."""
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # "spawn": hacer fork de un proceso con hilos (Flask, SocketIO, bot, Firestore)
+        # puede heredar locks tomados y colgar al worker
+        _pool = ProcessPoolExecutor(
+            max_workers=int(os.getenv("MEDIA_WORKERS", "2")),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+# ============================================================
+# 🔹 Trabajo de CPU (se ejecuta en el pool de procesos)
+# ============================================================
+def hash_and_thumbnail(path, kind):
+    """
+    Calcula el SHA-256 del archivo y, si es una foto, genera su miniatura JPEG
+    junto al original. Retorna (sha256, ruta_miniatura o None).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+
+    thumb_path = None
+    if kind == "photo" and Image is not None:
+        try:
+            with Image.open(path) as img:
+                img.thumbnail(THUMB_SIZE)
+                thumb_path = path + ".thumb.jpg"
+                img.convert("RGB").save(thumb_path, "JPEG", quality=75)
+        except Exception as e:
+            print("⚠️ No se pudo generar la miniatura:", e)
+            thumb_path = None
+    return h.hexdigest(), thumb_path
+
+
+# ============================================================
+# 🔹 Descarga en streaming (hilo de E/S)
+# ============================================================
+def _download_to_temp(url):
+    """Descarga por fragmentos a un archivo temporal sin cargarlo entero en memoria."""
+    fd, tmp_path = tempfile.mkstemp(prefix="vecibot_media_")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out, requests.get(url, stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_MEDIA_BYTES:
+                    raise ValueError("Archivo demasiado grande")
+                out.write(chunk)
+    except requests.RequestException as e:
+        os.remove(tmp_path)
+        # El mensaje de requests trae la URL https://api.telegram.org/file/bot<TOKEN>/...
+        status = getattr(e.response, "status_code", None)
+        detail = f" (HTTP {status})" if status else ""
+        raise MediaDownloadError(f"Descarga fallida: {type(e).__name__}{detail}") from None
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, size
+
+
+# ============================================================
+# 🔹 Ingesta de un archivo de Telegram
+# ============================================================
+async def ingest_telegram_file(tg_file, kind):
+    """
+    Guarda un archivo de Telegram (telegram.File) en el almacenamiento de objetos.
+    La descarga corre en un hilo y el hash/miniatura en un proceso aparte, así el
+    event loop del bot no se bloquea. Los duplicados (mismo hash) se reutilizan.
+    Retorna la referencia que se guarda en el incidente:
+    {'key', 'kind', 'size', 'thumb'}
+    """
+    ext = MEDIA_EXTENSIONS[kind]
+    store = get_store()
+    loop = asyncio.get_running_loop()
+
+    tmp_path, size = await asyncio.to_thread(_download_to_temp, tg_file.file_path)
+    thumb_tmp = None
+    try:
+        sha, thumb_tmp = await loop.run_in_executor(_get_pool(), hash_and_thumbnail, tmp_path, kind)
+        key = f"{sha}.{ext}"
+        thumb_key = f"{sha}.thumb.jpg" if thumb_tmp else None
+
+        if store.exists(key):
+            print(f"♻️ Evidencia duplicada reutilizada: {key}")
+        else:
+            await asyncio.to_thread(store.put_file, key, tmp_path)
+        if thumb_key and not store.exists(thumb_key):
+            await asyncio.to_thread(store.put_file, thumb_key, thumb_tmp)
+    finally:
+        for path in (tmp_path, thumb_tmp):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    return {"key": key, "kind": kind, "size": size, "thumb": thumb_key}
@@ -0,0 +1,65 @@
+# core/media_store.py
+import os
+import re
+import shutil
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MEDIA_STORE_DIR = os.getenv("MEDIA_STORE_DIR", "media_store")
+
+# Claves direccionadas por contenido: <sha256>[.thumb].<ext>
+_KEY_RE = re.compile(r"^[0-9a-f]{64}(\.thumb)?\.[a-z0-9]{2,4}$")
+
+
+def valid_key(key):
+    return bool(key and _KEY_RE.match(key))
+
+
+class ObjectStore:
+    """Interfaz mínima de almacenamiento de objetos (evidencias de los reportes)."""
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put_file(self, key, src_path):
+        """Mueve el archivo local src_path al almacenamiento bajo `key`."""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Retorna un objeto tipo archivo binario para leer `key`."""
+        raise NotImplementedError
+
+
+class LocalFileStore(ObjectStore):
+    """Almacenamiento en el sistema de archivos local: <root>/<ab>/<cd>/<key>."""
+
+    def __init__(self, root=MEDIA_STORE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        if not valid_key(key):
+            raise ValueError(f"Clave de objeto inválida: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key, src_path):
+        dest = self._path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.move(src_path, dest)
+
+    def open(self, key):
+        return open(self._path(key), "rb")
+
+
+_store = None
+
+
+def get_store():
+    """Almacenamiento configurado (por ahora, siempre local)."""
+    global _store
+    if _store is None:
+        _store = LocalFileStore()
+    return _store
@@ -0,0 +1,198 @@
+# core/models.py
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+def _to_float(v):
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _feedback_key(fb):
+    return (fb.get("rating", 0), fb.get("comment", "")) if fb else (0, "")
+
+
+@dataclass(slots=True)
+class Incident:
+    """
+    Incidente normalizado una sola vez a partir del documento de Firestore.
+    Las vistas (mapa/admin y lista de estadísticas) se calculan al primer uso y se
+    reutilizan mientras el documento y su feedback no cambien.
+    El objeto se comparte entre hilos de peticiones: el feedback se pasa a cada vista
+    en lugar de guardarse en el modelo, y cada vista cacheada se reemplaza con una sola
+    asignación (feedback, vista), así nunca se mezclan datos de dos peticiones.
+    """
+    id: str
+    user_id: object = None
+    username: str = "—"
+    reporter_name: str = "—"
+    reporter_dni: object = "—"
+    reporter_phone: object = "—"
+    message: str = ""
+    category: str = "Sin categoría"
+    address: str = "—"
+    status: str = "open"
+    response: str = ""
+    lat: float = None
+    lon: float = None
+    created_at: datetime = None
+    created_at_iso: str = None
+    raw_category: str = None
+    media: list = None
+    corroboration_count: int = 0
+    district: str = None
+    _map_view: dict = field(default=None, repr=False, compare=False)
+    _list_view: dict = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, d):
+        created_at = d.get("created_at")
+        if hasattr(created_at, "isoformat"):
+            created_at_iso = created_at.isoformat()
+        else:
+            created_at_iso = created_at
+            created_at = None
+        return cls(
+            id=d.get("id"),
+            user_id=d.get("user_id"),
+            username=d.get("username", "—"),
+            reporter_name=d.get("reporter_name") or d.get("username", "—"),
+            reporter_dni=d.get("reporter_dni", "—"),
+            reporter_phone=d.get("reporter_phone", "—"),
+            message=d.get("message", ""),
+            category=d.get("category", "Sin categoría"),
+            address=d.get("address", "—"),
+            status=d.get("status", "open"),
+            response=d.get("response", ""),
+            lat=_to_float(d.get("lat")),
+            lon=_to_float(d.get("lon")),
+            created_at=created_at,
+            created_at_iso=created_at_iso,
+            raw_category=d.get("category"),
+            media=d.get("media") or [],
+            corroboration_count=d.get("corroboration_count", 0),
+            district=d.get("district"),
+        )
+
+    @property
+    def has_location(self):
+        return self.lat is not None and self.lon is not None
+
+    def map_view(self, fb=None):
+        """Forma usada por el mapa público y el panel admin (/ y /incidents), con su feedback."""
+        key = _feedback_key(fb)
+        cached = self._map_view
+        if cached is None or cached[0] != key:
+            rating, comment = key
+            cached = self._map_view = (key, {
+                "id": self.id,
+                "user_id": self.user_id,
+                "username": self.username,
+                "reporter_name": self.reporter_name,
+                "reporter_dni": self.reporter_dni,
+                "reporter_phone": self.reporter_phone,
+                "message": self.message,
+                "category": self.category,
+                "address": self.address,
+                "status": self.status,
+                "response": self.response,
+                "lat": self.lat,
+                "lon": self.lon,
+                "created_at": self.created_at_iso,
+                # ⭐ Feedback externo
+                "rating": rating,
+                "comment": comment,
+                # 📎 Evidencias (solo referencias; las miniaturas se cargan al abrir el popup)
+                "media": self.media,
+                # 🤝 Reportes adicionales del mismo hecho
+                "corroboration_count": self.corroboration_count,
+                "district": self.district,
+            })
+        return cached[1]
+
+    def list_view(self, fb=None):
+        """Forma usada por la tabla de stats.html (/api/incidents/list), con su feedback."""
+        key = _feedback_key(fb)
+        cached = self._list_view
+        if cached is None or cached[0] != key:
+            rating, comment = key
+            cached = self._list_view = (key, {
+                "id": self.id,
+                "usuario": self.reporter_name,
+                "fecha": self.created_at_iso,
+                "categoria": self.raw_category or "—",
+                "descripcion": self.message,
+                "estado": self.status,
+                "rating": rating,
+                "comentario": comment,
+            })
+        return cached[1]
+
+
+# === Benchmark: normalización por diccionarios vs. modelo con vistas cacheadas ===
+def benchmark_models(n=20000, rounds=5):
+    """Compara tiempo y memoria asignada por petición del camino antiguo y del modelo."""
+    import json
+    import random
+    import time
+    import tracemalloc
+    from datetime import timezone
+    from core.serialization import dumps_bytes
+
+    rnd = random.Random(7)
+    now = datetime.now(timezone.utc)
+    docs = [{
+        "id": f"inc{i}", "user_id": rnd.randint(1, 10**9), "username": f"user{i}",
+        "message": "Robo de celular en la esquina " * 2, "address": "Av. Arequipa 123, Lima",
+        "lat": -12.05 + rnd.random() / 10, "lon": -77.04 + rnd.random() / 10,
+        "category": rnd.choice(["Robo", "Acoso", "Vandalismo", "Emergencia", "Otro"]),
+        "status": rnd.choice(["open", "resolved"]), "response": "", "created_at": now,
+        "reporter_name": f"Vecino {i}", "reporter_dni": "12345678", "reporter_phone": "999888777",
+    } for i in range(n)]
+    feedback = {f"inc{i}": {"rating": 4, "comment": "ok"} for i in range(0, n, 3)}
+
+    def legacy():
+        out = []
+        for inc in docs:
+            fb = feedback.get(inc.get("id"), {})
+            out.append({
+                "id": inc.get("id"), "user_id": inc.get("user_id"), "username": inc.get("username", "—"),
+                "reporter_name": inc.get("reporter_name") or inc.get("username", "—"),
+                "reporter_dni": inc.get("reporter_dni", "—"), "reporter_phone": inc.get("reporter_phone", "—"),
+                "message": inc.get("message", ""), "category": inc.get("category", "Sin categoría"),
+                "address": inc.get("address", "—"), "status": inc.get("status", "open"),
+                "response": inc.get("response", ""), "lat": float(inc["lat"]), "lon": float(inc["lon"]),
+                "created_at": inc["created_at"].isoformat(),
+                "rating": fb.get("rating", 0), "comment": fb.get("comment", ""),
+            })
+        return json.dumps(out, ensure_ascii=False).encode("utf-8")
+
+    cache = {}
+
+    def model():
+        out = []
+        for inc in docs:
+            m = cache.get(inc["id"])
+            if m is None:
+                m = cache[inc["id"]] = Incident.from_dict(inc)
+            out.append(m.map_view(feedback.get(m.id)))
+        return dumps_bytes(out)
+
+    for name, fn in (("legacy (dict + json)", legacy), ("Incident (cold)", model), ("Incident (warm)", model)):
+        runs = 1 if "cold" in name else rounds
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        elapsed = (time.perf_counter() - t0) / runs
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:22s} {elapsed * 1000:8.1f} ms/petición | pico {peak / 1e6:6.1f} MB | {n} incidentes")
+
+
+if __name__ == "__main__":
+    benchmark_models()
@@ -0,0 +1,134 @@
+# core/notifier.py
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+# Telegram limita a ~30 mensajes/s por bot; dejamos margen
+TELEGRAM_RATE_PER_SEC = float(os.getenv("TELEGRAM_RATE_PER_SEC", "25"))
+BROADCAST_BATCH_SIZE = 500
+
+
+class TelegramSender:
+    """
+    Emisor compartido de mensajes de Telegram.
+    Mantiene un único Bot y un event loop propio en un hilo de fondo, de modo que
+    cualquier hilo (Flask o el bot) puede encolar envíos sin bloquearse.
+    Los envíos respetan un límite global de mensajes por segundo.
+    """
+
+    def __init__(self, bot=None, rate_per_sec=TELEGRAM_RATE_PER_SEC, concurrency=20):
+        self._bot = bot
+        self.rate_per_sec = rate_per_sec
+        self.concurrency = concurrency
+        self.stats = Counter()
+        self._loop = None
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="telegram-sender", daemon=True).start()
+        return self._loop
+
+    def _get_bot(self):
+        if self._bot is None:
+            from telegram import Bot
+            self._bot = Bot(token=os.getenv("TELEGRAM_TOKEN"))
+        return self._bot
+
+    def broadcast(self, chat_ids, text, **kwargs):
+        """Encola un mensaje para varios chats. Retorna un Future con el nº de envíos exitosos."""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        return asyncio.run_coroutine_threadsafe(self._broadcast(chat_ids, text, kwargs), self._ensure_loop())
+
+    def send(self, chat_id, text, **kwargs):
+        return self.broadcast([chat_id], text, **kwargs)
+
+    async def _broadcast(self, chat_ids, text, kwargs):
+        sem = asyncio.Semaphore(self.concurrency)
+        sent = 0
+        for i in range(0, len(chat_ids), BROADCAST_BATCH_SIZE):
+            batch = chat_ids[i:i + BROADCAST_BATCH_SIZE]
+            results = await asyncio.gather(*(self._send_one(sem, cid, text, kwargs) for cid in batch))
+            sent += sum(results)
+        return sent
+
+    async def _throttle(self):
+        if not self.rate_per_sec:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1.0 / self.rate_per_sec
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send_one(self, sem, chat_id, text, kwargs):
+        async with sem:
+            for attempt in range(2):
+                await self._throttle()
+                try:
+                    await self._get_bot().send_message(chat_id=chat_id, text=text, **kwargs)
+                    self.stats["sent"] += 1
+                    return 1
+                except Exception as e:
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after and attempt == 0:
+                        self.stats["retry_after"] += 1
+                        await asyncio.sleep(float(retry_after))
+                        continue
+                    self.stats["failed"] += 1
+                    print(f"⚠️ Error al enviar mensaje al usuario {chat_id}: {e}")
+                    return 0
+        return 0
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender():
+    """Instancia compartida del emisor de Telegram."""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = TelegramSender()
+        return _sender
+
+
+# === Benchmark de difusión con un Bot simulado ===
+def benchmark_broadcast(subscribers=10000, rate_per_sec=None):
+    """Mide la consulta por radio y el throughput de entrega con un Bot simulado."""
+    from core.spatial_index import GridIndex
+
+    class StubBot:
+        async def send_message(self, chat_id, text, **kwargs):
+            await asyncio.sleep(0)
+
+    rnd = random.Random(42)
+    index = GridIndex()
+    center = (-12.0464, -77.0428)  # Lima
+    for uid in range(subscribers):
+        # Todos dentro de ~1 km del centro, con radio suficiente para recibir la alerta
+        index.upsert(uid, center[0] + rnd.uniform(-0.006, 0.006), center[1] + rnd.uniform(-0.006, 0.006), 2000)
+
+    t0 = time.perf_counter()
+    targets = index.query(*center)
+    t_query = time.perf_counter() - t0
+
+    sender = TelegramSender(bot=StubBot(), rate_per_sec=rate_per_sec, concurrency=100)
+    t0 = time.perf_counter()
+    sent = sender.broadcast(targets, "🚨 Alerta de prueba").result()
+    t_send = time.perf_counter() - t0
+
+    print(f"Suscriptores: {subscribers} | destinatarios: {len(targets)}")
+    print(f"Consulta por radio: {t_query * 1000:.2f} ms")
+    print(f"Entrega: {sent} mensajes en {t_send:.2f}s ({sent / t_send:.0f} msg/s)")
+
+
+if __name__ == "__main__":
+    benchmark_broadcast()
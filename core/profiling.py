@@ -0,0 +1,147 @@
+# core/profiling.py
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_LOG_SIZE = 200
+MAX_PROFILE_SECONDS = 60
+
+_current = contextvars.ContextVar("vecibot_trace", default=None)
+slow_requests = deque(maxlen=SLOW_LOG_SIZE)
+
+
+# ============================================================
+# 🔹 Trazas por petición / handler
+# ============================================================
+class RequestTrace:
+    """Tiempo acumulado por tipo de dependencia (firestore, mapbox, telegram, serialization)."""
+
+    __slots__ = ("name", "started", "spans", "counts")
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = Counter()
+        self.counts = Counter()
+
+
+def start_trace(name):
+    """Inicia la traza del contexto actual (petición Flask o handler del bot)."""
+    trace = RequestTrace(name)
+    return trace, _current.set(trace)
+
+
+def finish_trace(trace, token):
+    """
+    Cierra la traza y, si supera el umbral, la guarda en el registro de peticiones lentas.
+    Retorna (total_ms, breakdown_ms).
+    """
+    _current.reset(token)
+    total_ms = (time.perf_counter() - trace.started) * 1000
+    breakdown = {k: round(v * 1000, 1) for k, v in trace.spans.items()}
+    breakdown["other"] = round(max(total_ms - sum(breakdown.values()), 0.0), 1)
+
+    if total_ms >= SLOW_REQUEST_MS:
+        record = {
+            "name": trace.name,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "total_ms": round(total_ms, 1),
+            "breakdown_ms": breakdown,
+            "calls": dict(trace.counts),
+        }
+        slow_requests.append(record)
+        print(f"🐢 Petición lenta {trace.name}: {total_ms:.0f} ms {breakdown}")
+    return total_ms, breakdown
+
+
+@contextmanager
+def span(kind):
+    """Mide un bloque y lo suma a la traza actual (sin coste si no hay traza activa)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans[kind] += time.perf_counter() - t0
+        trace.counts[kind] += 1
+
+
+def traced_handler(fn):
+    """Decorador para los handlers async de BotView: una traza por update."""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        trace, token = start_trace(f"bot:{fn.__name__}")
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            finish_trace(trace, token)
+    return wrapper
+
+
+def traced(kind):
+    """Decorador para funciones síncronas: suma su duración al tipo `kind`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_slow_threshold(ms):
+    global SLOW_REQUEST_MS
+    SLOW_REQUEST_MS = float(ms)
+
+
+# ============================================================
+# 🔹 Profiler por muestreo (formato "collapsed" para flamegraph)
+# ============================================================
+_profile_lock = threading.Lock()
+
+
+def _frame_stack(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return ";".join(stack)
+
+
+def sample_stacks(seconds, interval=0.005):
+    """
+    Muestrea las pilas de todos los hilos durante `seconds` segundos y devuelve
+    el volcado "collapsed" (una línea por pila: `hilo;archivo:func;... N`),
+    compatible con flamegraph.pl / speedscope. Solo un muestreo a la vez.
+    """
+    seconds = min(float(seconds), MAX_PROFILE_SECONDS)
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("Ya hay un muestreo en curso")
+    try:
+        me = threading.get_ident()
+        names = {}
+        counts = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                counts[f"{names.get(ident, ident)};{_frame_stack(frame)}"] += 1
+            time.sleep(interval)
+        return "\n".join(f"{stack} {n}" for stack, n in counts.most_common())
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,219 @@
+# core/rate_limiter.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class RateLimited(Exception):
+    """Se superó el límite de un bucket; `retry_after` en segundos."""
+
+    def __init__(self, key, retry_after):
+        super().__init__(f"Límite excedido para {key}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """No hay capacidad ni hueco en la cola: la petición se descarta (load shedding)."""
+
+
+def parse_limit(spec):
+    """'5/60' -> (rate=5/60 tokens/s, burst=5)."""
+    count, seconds = spec.split("/")
+    return float(count) / float(seconds), float(count)
+
+
+# ============================================================
+# 🔹 Almacenamiento de buckets
+# ============================================================
+class MemoryStore:
+    """Token buckets en memoria del proceso (un dict protegido por lock)."""
+
+    SWEEP_EVERY = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def consume(self, key, rate, burst, cost=1.0):
+        """Retorna (permitido, segundos_hasta_reintentar)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate
+            # Cada bucket guarda cuándo estaría lleno de nuevo con su propio rate/burst
+            full_at = now + (burst - tokens) / rate if rate else now
+            self._buckets[key] = (tokens, now, full_at)
+
+            self._ops += 1
+            if self._ops >= self.SWEEP_EVERY:
+                self._ops = 0
+                self._sweep(now)
+        return allowed, retry_after
+
+    def _sweep(self, now):
+        # Un bucket que ya se habría rellenado por completo equivale a no tenerlo
+        self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+
+
+class RedisStore:
+    """Token buckets compartidos entre procesos (requiere el paquete `redis`)."""
+
+    _SCRIPT = """
+    local t = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local tokens = tonumber(t[1]) or burst
+    local ts = tonumber(t[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed, retry = 0, 0
+    if tokens >= cost then tokens = tokens - cost; allowed = 1 else retry = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(retry)}
+    """
+
+    def __init__(self, url):
+        import redis
+        self._errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+        # Si Redis cae en tiempo de ejecución se sigue limitando en memoria (fail open)
+        self._fallback = MemoryStore()
+        self._down = False
+
+    def consume(self, key, rate, burst, cost=1.0):
+        try:
+            allowed, retry = self._script(keys=[f"vecibot:rl:{key}"], args=[rate, burst, time.time(), cost])
+        except self._errors as e:
+            if not self._down:
+                self._down = True
+                print("⚠️ Redis no disponible para el rate limit, se usa memoria:", e)
+            return self._fallback.consume(key, rate, burst, cost)
+        if self._down:
+            self._down = False
+            print("✅ Redis disponible de nuevo para el rate limit")
+        return bool(allowed), float(retry)
+
+
+# ============================================================
+# 🔹 Limitador por usuario / IP / global
+# ============================================================
+class RateLimiter:
+    """
+    Aplica varios token buckets a la vez. `limits` asocia un ámbito ('user', 'ip',
+    'global:geocode'...) a (rate, burst). Los ámbitos individuales se revisan antes
+    que los globales para que un abusador no consuma la cuota de todos.
+    """
+
+    def __init__(self, limits, store=None):
+        self.limits = limits
+        self.store = store or MemoryStore()
+
+    def check(self, **scopes):
+        """
+        check(user=123, **{'global:report': ''}) -> None o lanza RateLimited.
+        Cada argumento es ámbito=identificador; el bucket es '<ámbito>:<identificador>'.
+        """
+        for scope in sorted(scopes, key=lambda s: s.startswith("global")):
+            rate, burst = self.limits[scope]
+            key = f"{scope}:{scopes[scope]}"
+            allowed, retry_after = self.store.consume(key, rate, burst)
+            if not allowed:
+                raise RateLimited(key, retry_after)
+
+
+class AdmissionController:
+    """
+    Limita el trabajo concurrente de una ruta: hasta `max_concurrent` en curso y
+    hasta `max_queue` esperando como mucho `queue_timeout` s. El resto se descarta
+    de inmediato (Overloaded) para que la latencia de los demás no se dispare.
+    """
+
+    def __init__(self, max_concurrent, max_queue=0, queue_timeout=0.0):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._sem = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        if not self._sem.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    raise Overloaded()
+                self._waiting += 1
+            try:
+                acquired = self.queue_timeout > 0 and self._sem.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                raise Overloaded()
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+
+def _build_store():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if url:
+        try:
+            return RedisStore(url)
+        except Exception as e:
+            print("⚠️ No se pudo usar Redis para el rate limit, se usa memoria:", e)
+    return MemoryStore()
+
+
+limiter = RateLimiter({
+    "user": parse_limit(os.getenv("RATE_LIMIT_USER", "10/60")),
+    "ip": parse_limit(os.getenv("RATE_LIMIT_IP", "30/60")),
+    "global:geocode": parse_limit(os.getenv("RATE_LIMIT_GEOCODE_GLOBAL", "600/60")),
+    "global:report": parse_limit(os.getenv("RATE_LIMIT_REPORT_GLOBAL", "300/60")),
+}, _build_store())
+
+geocode_admission = AdmissionController(
+    max_concurrent=int(os.getenv("GEOCODE_MAX_CONCURRENT", "8")),
+    max_queue=int(os.getenv("GEOCODE_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("GEOCODE_QUEUE_TIMEOUT", "2")),
+)
+# El bot corre en un event loop: sin cola, se descarta al instante si está saturado
+report_admission = AdmissionController(max_concurrent=int(os.getenv("REPORT_MAX_CONCURRENT", "32")))
+
+
+# === Microbenchmark del coste del limitador ===
+def benchmark_limiter(n=200000):
+    """Coste por verificación (memoria) con una clave caliente y con muchas claves distintas."""
+    bench = RateLimiter({"user": (1e9, 1e9), "global:report": (1e9, 1e9)})
+    admission = AdmissionController(max_concurrent=4)
+
+    cases = (
+        ("1 clave (user + global)", lambda i: bench.check(user=1, **{"global:report": ""})),
+        ("100k claves (user + global)", lambda i: bench.check(user=i % 100000, **{"global:report": ""})),
+    )
+    for name, fn in cases:
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        print(f"{name:30s} {(time.perf_counter() - t0) / n * 1e6:6.2f} µs/verificación")
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with admission.admit():
+            pass
+    print(f"{'admisión (sin contención)':30s} {(time.perf_counter() - t0) / n * 1e6:6.2f} µs/petición")
+
+
+if __name__ == "__main__":
+    benchmark_limiter()
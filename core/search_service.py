@@ -0,0 +1,631 @@
+# core/search_service.py
+"""
+Búsqueda de texto completo sobre incidentes con un índice invertido en memoria.
+
+- Campos: descripción, dirección, respuesta de la comisaría, nombre y teléfono del
+  reportante y categoría, cada uno con su peso.
+- Tokenización en español sin acentos ni mayúsculas ("Plaza San Martín" ≈ "plaza san martin")
+  y coincidencia por prefijo ("mart" encuentra "martin", "martes"...).
+- Se mantiene en vivo con los eventos new_incident / update_incident; un cambio de
+  estado sin cambio de texto no toca las postings.
+- Ranking: suma por término de idf × peso del campo (saturado); empate → más reciente.
+- La carga inicial recorre el historial por páginas (fuera del circuit breaker) y se
+  reintenta con espera creciente; hasta que termina no se sirven resultados (ready=False).
+"""
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from core.events import on_event
+
+load_dotenv()
+
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "32"))
+SEARCH_COMPACT_EVERY_S = 300
+WARMUP_RETRY_S = 5          # espera inicial entre intentos de construcción (se duplica hasta WARMUP_RETRY_MAX_S)
+WARMUP_RETRY_MAX_S = 300
+
+FIELD_WEIGHTS = {
+    "message": 1.0,
+    "address": 1.5,
+    "response": 0.5,
+    "reporter_name": 2.0,
+    "reporter_phone": 3.0,
+    "category": 1.0,
+}
+PREFIX_FACTOR = 0.7
+K1 = 1.2
+LEVELS_PER_UNIT = 4     # el peso saturado se guarda en cuartos (1..9)
+# Listas grandes se evalúan como mapas de bits (int de Python: AND/OR/conteo en C)
+BITS_CACHE_MIN_LEN = 2048
+BITS_CACHE_MAX = 512
+
+STOPWORDS = frozenset(
+    "a al algo como con de del el en es esta este ha hay la las le lo los me mi muy no o para pero por "
+    "que se si sin su sus un una uno y ya".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Posiciones de la tupla guardada por documento
+_ID, _STATUS, _CATEGORY, _CREATED, _MESSAGE, _ADDRESS, _NAME, _DISTRICT, _LAT, _LON = range(10)
+_DOC_FIELDS = ("id", "status", "category", "created_at", "message", "address", "reporter_name", "district", "lat", "lon")
+
+
+def normalize(text):
+    """Minúsculas y sin tildes/diéresis (la ñ queda como n)."""
+    return unicodedata.normalize("NFKD", str(text).lower()).encode("ascii", "ignore").decode("ascii")
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def _phone_token(phone):
+    # Sin prefijo de país: se comparan los últimos 9 dígitos (celulares de Perú)
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-9:] if len(digits) >= 6 else None
+
+
+def query_tokens(query):
+    """Tokens de la consulta; los grupos de dígitos ("987 654 321") se unen como un teléfono."""
+    tokens = tokenize(query)
+    digits = "".join(t for t in tokens if t.isdigit())
+    if len(digits) >= 6 and sum(t.isdigit() for t in tokens) > 1:
+        tokens = [t for t in tokens if not t.isdigit()] + [digits[-9:]]
+    return list(dict.fromkeys(tokens))
+
+
+def _bits(ids):
+    """Mapa de bits (int) con los docnos dados; solo recorre el rango [min, max]."""
+    if not ids:
+        return 0
+    base = min(ids) >> 3
+    buf = bytearray((max(ids) >> 3) - base + 1)
+    for d in ids:
+        buf[(d >> 3) - base] |= 1 << (d & 7)
+    return int.from_bytes(buf, "little") << (base << 3)
+
+
+def _popcount(bits):
+    return bits.bit_count() if hasattr(bits, "bit_count") else bin(bits).count("1")
+
+
+def _top_bits(bits, k):
+    """Los k docnos más altos (más recientes) de un mapa de bits."""
+    found = []
+    while bits and len(found) < k:
+        d = bits.bit_length() - 1
+        found.append(d)
+        bits ^= 1 << d
+    return found
+
+
+def _created_iso(incident):
+    created = incident.get("created_at")
+    if isinstance(created, datetime):
+        return created.isoformat()
+    if isinstance(created, str) and created[:1].isdigit():
+        return created
+    return datetime.now().astimezone().isoformat()  # sin fecha utilizable
+
+
+class SearchIndex:
+    """
+    Índice invertido con postings de solo-agregar, separadas por nivel de peso:
+    término -> {nivel: array de docnos}. Cada versión indexada de un incidente recibe
+    un docno creciente, así las listas quedan ordenadas (reciente = mayor docno).
+
+    Las consultas trabajan con operaciones de conjuntos por nivel en vez de puntuar
+    documento por documento en Python: los documentos se agrupan por puntaje y solo se
+    ordenan los necesarios para la página pedida. Si hasta el token más selectivo tiene
+    muchas postings se usan mapas de bits (cacheados por término y nivel) en lugar de
+    sets. Las versiones reemplazadas quedan en `_dead` hasta que compact() las elimina.
+    """
+
+    def __init__(self, max_expansions=SEARCH_MAX_EXPANSIONS):
+        self.max_expansions = max_expansions
+        self._postings = {}         # término -> {nivel: array('i') de docnos}
+        self._df = {}               # término -> nº de postings
+        self._terms = []            # vocabulario ordenado (búsqueda por prefijo)
+        self._recent_terms = []     # términos nuevos, ordenados aparte y fusionados por lotes
+        self._docs = []             # docno -> tupla con lo que devuelve la búsqueda (None si murió)
+        self._docno = {}            # id de incidente -> docno vigente
+        self._text_key = {}         # id de incidente -> hash del texto indexado
+        self._dead = set()          # docnos reemplazados o eliminados
+        self._dead_bits = 0         # lo mismo como mapa de bits
+        self._by_district = {}      # distrito -> set de docnos
+        self._district_bits = {}    # distrito -> mapa de bits (se crea al consultarlo)
+        self._bits_cache = OrderedDict()    # (término, nivel) -> (largo, mapa de bits)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docno)
+
+    # === Indexación ===
+    def upsert(self, incident):
+        """Indexa o actualiza un incidente (dict de Firestore o payload de evento)."""
+        incident_id = incident.get("id")
+        if not incident_id:
+            return
+        incident_id = str(incident_id)
+        fields = [incident.get(f) for f in FIELD_WEIGHTS]
+        text_key = hash(tuple(str(v or "") for v in fields))
+
+        with self._lock:
+            docno = self._docno.get(incident_id)
+            if docno is not None and self._text_key.get(incident_id) == text_key:
+                # Solo cambió el estado u otro dato no indexado
+                self._docs[docno] = self._doc_tuple(incident_id, incident, self._docs[docno])
+                return
+            previous = None
+            if docno is not None:
+                previous = self._docs[docno]
+                self._kill(docno)
+
+            weights = {}
+            for field, value in zip(FIELD_WEIGHTS, fields):
+                if field == "reporter_phone":
+                    phone = _phone_token(value)
+                    tokens = [phone] if phone else []
+                else:
+                    tokens = tokenize(value)
+                for t in tokens:
+                    weights[t] = weights.get(t, 0.0) + FIELD_WEIGHTS[field]
+
+            docno = len(self._docs)
+            doc = self._doc_tuple(incident_id, incident, previous)
+            self._docs.append(doc)
+            self._docno[incident_id] = docno
+            self._text_key[incident_id] = text_key
+            if doc[_DISTRICT]:
+                self._by_district.setdefault(doc[_DISTRICT], set()).add(docno)
+                if doc[_DISTRICT] in self._district_bits:
+                    self._district_bits[doc[_DISTRICT]] |= 1 << docno
+            for term, w in weights.items():
+                level = max(1, round(w * (K1 + 1) / (w + K1) * LEVELS_PER_UNIT))
+                levels = self._postings.get(term)
+                if levels is None:
+                    levels = self._postings[term] = {}
+                    self._df[term] = 0
+                    self._add_term(term)
+                ids = levels.get(level)
+                if ids is None:
+                    ids = levels[level] = array("i")
+                ids.append(docno)
+                self._df[term] += 1
+
+    def _add_term(self, term):
+        # Insertar en el vocabulario grande cuesta O(V) por término: los nuevos van a una lista
+        # pequeña que se fusiona cuando crece (tamaño proporcional al vocabulario).
+        insort(self._recent_terms, term)
+        if len(self._recent_terms) > max(2048, len(self._terms) // 32):
+            self._terms = sorted(self._terms + self._recent_terms)
+            self._recent_terms = []
+
+    @staticmethod
+    def _doc_tuple(incident_id, incident, previous=None):
+        def pick(field, pos):
+            value = incident.get(field)
+            return value if value is not None or previous is None else previous[pos]
+
+        return (
+            incident_id,
+            pick("status", _STATUS),
+            pick("category", _CATEGORY),
+            previous[_CREATED] if previous else _created_iso(incident),
+            (pick("message", _MESSAGE) or "")[:200],
+            pick("address", _ADDRESS),
+            incident.get("reporter_name") or incident.get("username") or (previous[_NAME] if previous else None),
+            pick("district", _DISTRICT),
+            pick("lat", _LAT),
+            pick("lon", _LON),
+        )
+
+    def remove(self, incident_id):
+        with self._lock:
+            docno = self._docno.pop(str(incident_id), None)
+            self._text_key.pop(str(incident_id), None)
+            if docno is not None:
+                self._kill(docno)
+
+    def _kill(self, docno):
+        doc = self._docs[docno]
+        if doc and doc[_DISTRICT] in self._by_district:
+            self._by_district[doc[_DISTRICT]].discard(docno)
+            self._district_bits.pop(doc[_DISTRICT], None)
+        self._docs[docno] = None
+        self._dead.add(docno)
+        self._dead_bits |= 1 << docno
+
+    def needs_compaction(self):
+        return len(self._dead) > max(10000, len(self._docno) // 4)
+
+    def compact(self):
+        """Reconstruye las postings sin versiones muertas (mismo orden relativo)."""
+        with self._lock:
+            remap = array("i", [-1]) * len(self._docs)
+            docs = []
+            for old, doc in enumerate(self._docs):
+                if doc is not None:
+                    remap[old] = len(docs)
+                    docs.append(doc)
+            postings, df = {}, {}
+            for term, levels in self._postings.items():
+                new_levels = {}
+                for level, ids in levels.items():
+                    new_ids = array("i", (remap[d] for d in ids if remap[d] >= 0))
+                    if new_ids:
+                        new_levels[level] = new_ids
+                if new_levels:
+                    postings[term] = new_levels
+                    df[term] = sum(map(len, new_levels.values()))
+            self._postings, self._df = postings, df
+            self._terms = sorted(postings)
+            self._recent_terms = []
+            self._docs = docs
+            self._docno = {incident_id: remap[d] for incident_id, d in self._docno.items()}
+            self._by_district = {k: {remap[d] for d in v} for k, v in self._by_district.items()}
+            removed = len(self._dead)
+            self._dead, self._dead_bits = set(), 0
+            self._district_bits = {}
+            self._bits_cache.clear()
+            return removed
+
+    # === Consulta ===
+    def _expand(self, token):
+        """Términos del vocabulario para un token: exacto + prefijos más frecuentes, con su idf."""
+        matches = []
+        for terms in (self._terms, self._recent_terms):
+            lo = bisect_left(terms, token)
+            matches += terms[lo:bisect_left(terms, token + "\x7f", lo)]
+        if len(matches) > self.max_expansions:
+            matches = heapq.nlargest(self.max_expansions, matches, key=self._df.__getitem__)
+            if token in self._postings and token not in matches:
+                matches.append(token)
+        n = max(len(self._docno), 1)
+        return [
+            (term, (1.0 if term == token else PREFIX_FACTOR) * math.log(1 + n / self._df[term]))
+            for term in matches
+        ]
+
+    def _group_levels(self, expansions):
+        """[(puntaje, término, nivel, array de docnos), ...] del grupo de un token, de mayor a menor puntaje."""
+        levels = []
+        for term, mult in expansions:
+            for level, ids in self._postings[term].items():
+                levels.append((round(level / LEVELS_PER_UNIT * mult, 4), term, level, ids))
+        levels.sort(key=lambda x: x[0], reverse=True)
+        return levels
+
+    def _level_bits(self, term, level, ids):
+        """Mapa de bits de una lista de postings; las grandes se cachean y se actualizan por la cola."""
+        key = (term, level)
+        n = len(ids)
+        cached = self._bits_cache.get(key)
+        if cached is not None:
+            length, bits = cached
+            if length < n:
+                bits |= _bits(ids[length:])
+        else:
+            bits = _bits(ids)
+        if n >= BITS_CACHE_MIN_LEN:
+            self._bits_cache[key] = (n, bits)
+            self._bits_cache.move_to_end(key)
+            while len(self._bits_cache) > BITS_CACHE_MAX:
+                self._bits_cache.popitem(last=False)
+        return bits
+
+    def _district_bitmap(self, district):
+        bits = self._district_bits.get(district)
+        if bits is None:
+            bits = self._district_bits[district] = _bits(self._by_district.get(district, ()))
+        return bits
+
+    def prewarm(self, limit=BITS_CACHE_MAX // 2):
+        """Construye de antemano los mapas de bits de las listas más largas (primera consulta rápida)."""
+        with self._lock:
+            largest = heapq.nlargest(limit, (
+                (len(ids), term, level) for term, levels in self._postings.items()
+                for level, ids in levels.items() if len(ids) >= BITS_CACHE_MIN_LEN
+            ))
+            for _, term, level in largest:
+                self._level_bits(term, level, self._postings[term][level])
+            return len(largest)
+
+    @staticmethod
+    def _intersect(candidates, ids):
+        if len(candidates) * 16 < len(ids):
+            # Pocos candidatos frente a la lista: bisección
+            found = set()
+            n = len(ids)
+            for d in candidates:
+                i = bisect_left(ids, d)
+                if i < n and ids[i] == d:
+                    found.add(d)
+            return found
+        return candidates.intersection(ids)
+
+    def search(self, query, offset=0, limit=20, district=None):
+        """(total, [(score, doc), ...]) con todos los tokens de la consulta presentes (AND)."""
+        tokens = query_tokens(query)
+        if not tokens:
+            return 0, []
+        with self._lock:
+            groups = []
+            for token in tokens:
+                expansions = self._expand(token)
+                if not expansions:
+                    return 0, []
+                groups.append((sum(self._df[t] for t, _ in expansions), expansions))
+            groups.sort(key=lambda g: g[0])
+
+            need = offset + limit
+            if groups[0][0] * 32 >= len(self._docs):
+                buckets = self._match_bits(groups, district)
+                total = sum(map(_popcount, buckets.values()))
+                pick = _top_bits
+            else:
+                buckets = self._match_sets(groups, district)
+                total = sum(map(len, buckets.values()))
+                pick = lambda bucket, k: heapq.nlargest(k, bucket)
+
+            top = []
+            for score in sorted(buckets, reverse=True):
+                if len(top) >= need:
+                    break
+                top.extend((score, d) for d in pick(buckets[score], need - len(top)))
+            return total, [(score, dict(zip(_DOC_FIELDS, self._docs[d]))) for score, d in top[offset:need]]
+
+    def _match_sets(self, groups, district):
+        """{puntaje acumulado: set de docnos} de los documentos que contienen todos los grupos."""
+        buckets = None
+        for _, expansions in groups:
+            if buckets is None:
+                # Primer grupo (el más chico); si un doc aparece en varios niveles gana el más alto
+                buckets, seen = {}, set(self._dead)
+                allowed = self._by_district.get(district, set()) if district else None
+                for score, _, _, ids in self._group_levels(expansions):
+                    hit = set(ids) if allowed is None else self._intersect(allowed, ids)
+                    hit -= seen
+                    if hit:
+                        seen |= hit
+                        buckets.setdefault(score, set()).update(hit)
+            else:
+                remaining = set().union(*buckets.values())
+                hits = []
+                for score, _, _, ids in self._group_levels(expansions):
+                    if not remaining:
+                        break
+                    hit = self._intersect(remaining, ids)
+                    if hit:
+                        remaining -= hit
+                        hits.append((score, hit))
+                combined = {}
+                for bscore, bset in buckets.items():
+                    for gscore, hit in hits:
+                        both = bset & hit
+                        if both:
+                            combined.setdefault(round(bscore + gscore, 4), set()).update(both)
+                buckets = combined
+            if not buckets:
+                break
+        return buckets
+
+    def _match_bits(self, groups, district):
+        """Como _match_sets, pero con mapas de bits: {puntaje acumulado: int}."""
+        buckets = None
+        for _, expansions in groups:
+            levels = [(score, self._level_bits(term, level, ids))
+                      for score, term, level, ids in self._group_levels(expansions)]
+            if buckets is None:
+                buckets, seen = {}, self._dead_bits
+                allowed = self._district_bitmap(district) if district else None
+                for score, bits in levels:
+                    hit = bits & ~seen
+                    if allowed is not None:
+                        hit &= allowed
+                    if hit:
+                        seen |= hit
+                        buckets[score] = buckets.get(score, 0) | hit
+            else:
+                remaining = 0
+                for bits in buckets.values():
+                    remaining |= bits
+                hits = []
+                for score, bits in levels:
+                    if not remaining:
+                        break
+                    hit = remaining & bits
+                    if hit:
+                        remaining &= ~hit
+                        hits.append((score, hit))
+                combined = {}
+                for bscore, bbits in buckets.items():
+                    for gscore, hit in hits:
+                        both = bbits & hit
+                        if both:
+                            key = round(bscore + gscore, 4)
+                            combined[key] = combined.get(key, 0) | both
+                buckets = combined
+            if not buckets:
+                break
+        return buckets
+
+
+# ==========================
+# 🔌 Instancia del servicio
+# ==========================
+_index = SearchIndex()
+_ready = False
+_started = False
+_start_lock = threading.Lock()
+
+
+def index_incident(incident):
+    """Listener de new_incident / update_incident."""
+    if incident:
+        _index.upsert(incident)
+
+
+def search_incidents(query, page=1, per_page=20, district=None):
+    page = max(int(page or 1), 1)
+    per_page = min(max(int(per_page or 20), 1), 100)
+    t0 = time.perf_counter()
+    if _ready:
+        total, hits = _index.search(query, (page - 1) * per_page, per_page, district)
+    else:
+        total, hits = 0, []  # índice incompleto: resultados parciales serían engañosos
+    return {
+        "query": query,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "took_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "ready": _ready,
+        "results": [dict(doc, score=score) for score, doc in hits],
+    }
+
+
+def _build_from_history():
+    from data import repository_firebase as repository
+    t0 = time.perf_counter()
+    seen = 0
+    for page in repository.iter_incident_pages():  # activos + archivo, por páginas
+        seen += len(page)
+        # Lo que ya llegó por eventos es más nuevo y se respeta; un reintento salta lo ya cargado
+        for inc in page:
+            if str(inc.get("id")) not in _index._docno:
+                _index.upsert(inc)
+    _index.prewarm()
+    print(f"🔎 Índice de búsqueda listo: {len(_index)} incidentes ({seen} leídos) en {time.perf_counter() - t0:.1f}s")
+
+
+def _warm_up():
+    """Construye el índice desde el historial, reintentando con espera creciente hasta lograrlo."""
+    global _ready
+    delay = WARMUP_RETRY_S
+    while True:
+        try:
+            _build_from_history()
+        except Exception as e:
+            print(f"⚠️ No se pudo construir el índice de búsqueda (reintento en {delay:.0f}s):", e)
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+            continue
+        _ready = True
+        return
+
+
+def _loop():
+    on_event("new_incident", index_incident)
+    on_event("update_incident", index_incident)
+    _warm_up()
+    while True:
+        time.sleep(SEARCH_COMPACT_EVERY_S)
+        if _index.needs_compaction():
+            print(f"🧹 Índice de búsqueda: {_index.compact()} versiones antiguas eliminadas")
+
+
+def start_search_index():
+    """Registra los listeners y construye el índice en un hilo de fondo."""
+    global _started
+    with _start_lock:
+        if not _started:
+            _started = True
+            threading.Thread(target=_loop, daemon=True, name="search-index").start()
+
+
+# === Benchmark con 500k incidentes ===
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except Exception:
+        return float("nan")
+
+
+def benchmark_search(n=500000, queries=200):
+    import random
+    import string
+
+    rnd = random.Random(39)
+    common = ("robo celular cartera asalto moto auto bicicleta acoso calle esquina parque paradero noche mañana "
+              "vecino sospechoso pelea ruido grafiti luminaria basura policía serenazgo ayuda herido puerta "
+              "tienda bodega mercado colegio iglesia banco cajero farmacia combi bus taxi").split()
+    # Vocabulario con frecuencias tipo Zipf: pocas palabras muy comunes y una cola larga
+    vocab = common + ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 10))) for _ in range(20000)]
+    cum = list(__import__("itertools").accumulate(1 / (rank + 1) ** 1.05 for rank in range(len(vocab))))
+    streets = [f"{rnd.choice(['Av.', 'Jr.', 'Calle', 'Pasaje'])} {rnd.choice(vocab[40:2000]).title()}" for _ in range(3000)]
+    streets[:3] = ["Plaza San Martín", "Av. Abancay", "Av. Arequipa"]
+    first = ["José", "María", "Luis", "Ana", "Jorge", "Rosa", "Carlos", "Lucía", "Pedro", "Elena"]
+    last = ["Pérez", "Quispe", "Ramírez", "Flores", "Mendoza", "Huamán", "García", "Torres", "Rojas", "Vargas"]
+    reporters = [(f"{rnd.choice(first)} {rnd.choice(last)} {rnd.choice(last)}", f"+51 9{rnd.randint(10000000, 99999999)}")
+                 for _ in range(50000)]
+    cats = ["Robo", "Acoso", "Vandalismo", "Emergencia", "Otro"]
+
+    index = SearchIndex()
+    rss0 = _rss_mb()
+    sample = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        name, phone = rnd.choice(reporters)
+        inc = {
+            "id": f"inc{i}",
+            "message": " ".join(rnd.choices(vocab, cum_weights=cum, k=rnd.randint(5, 20))),
+            "address": f"{rnd.choice(streets)} {rnd.randint(100, 3000)}, Lima",
+            "response": "Patrullero enviado a la zona" if rnd.random() < 0.3 else "",
+            "reporter_name": name,
+            "reporter_phone": phone,
+            "category": rnd.choice(cats),
+            "status": "open",
+            "created_at": "2026-01-01T00:00:00",
+        }
+        index.upsert(inc)
+        if i % 25 == 0 and len(sample) < 20000:
+            sample.append(inc)
+    build_s = time.perf_counter() - t0
+    mem_mb = _rss_mb() - rss0
+
+    t0 = time.perf_counter()
+    warmed = index.prewarm()
+    prewarm_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for inc in sample:
+        index.upsert(dict(inc, status="resolved"))
+    status_us = (time.perf_counter() - t0) / len(sample) * 1e6
+    t0 = time.perf_counter()
+    for inc in sample[:2000]:
+        index.upsert(dict(inc, response="Caso derivado a fiscalía"))
+    reindex_us = (time.perf_counter() - t0) / 2000 * 1e6
+
+    phone = reporters[7][1]
+    name = reporters[7][0].split()[1]
+    print(f"{n} incidentes indexados en {build_s:.1f}s | {len(index._postings)} términos | +{mem_mb:.0f} MB RSS "
+          f"| cambio de estado {status_us:.1f} µs | reindexado {reindex_us:.0f} µs "
+          f"| {warmed} mapas de bits precalculados en {prewarm_s:.1f}s")
+    for q in ["plaza san martin", "martin", "robo", "robo celular", "luminaria esquina noche", "abanc",
+              f"{name} robo", phone[-9:-6] + " " + phone[-6:-3] + " " + phone[-3:], phone[-9:-4], "mer", "zzqx"]:
+        times = []
+        for _ in range(queries):
+            t = time.perf_counter()
+            total, _ = index.search(q, 0, 20)
+            times.append((time.perf_counter() - t) * 1000)
+        cold = times[0]
+        times.sort()
+        print(f"  {q!r:28} {total:7d} resultados | p50 {times[len(times) // 2]:6.2f} ms "
+              f"| p95 {times[int(len(times) * 0.95)]:6.2f} ms | primera {cold:6.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark_search()
@@ -0,0 +1,49 @@
+# core/serialization.py
+"""
+Serialización JSON rápida: usa orjson si está instalado y, si no, json estándar.
+Ambos caminos producen UTF-8 sin escapar acentos y convierten datetime a ISO 8601.
+"""
+import json
+from datetime import datetime
+from core.profiling import span
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+def _default(v):
+    if isinstance(v, datetime) or hasattr(v, "isoformat"):
+        return v.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(v).__name__}")
+
+
+def dumps_bytes(obj):
+    """Serializa a bytes UTF-8."""
+    with span("serialization"):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def dumps(obj):
+    """Serializa a str (p. ej. para incrustar en una plantilla)."""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class SocketJSON:
+    """
+    Módulo JSON para Socket.IO (SocketIO(json=SocketJSON)): los payloads de los
+    eventos traen datetime de Firestore, que el json estándar no sabe serializar.
+    Cualquier otro tipo desconocido es un error (TypeError), no un texto cualquiera.
+    """
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        kwargs.setdefault("default", _default)
+        return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs)
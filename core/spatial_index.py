@@ -0,0 +1,172 @@
+# core/spatial_index.py
+import math
+import threading
+from collections import deque
+
+EARTH_RADIUS_M = 6371000.0
+# Tamaño de celda en grados (~1.1 km de latitud)
+DEFAULT_CELL_DEG = 0.01
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Distancia aproximada en metros (equirectangular, suficiente para radios de pocos km)."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+
+class GridIndex:
+    """
+    Índice espacial en rejilla para puntos con radio propio (p. ej. vecinos suscritos a alertas).
+    Cada punto vive en la celda de su ubicación; una consulta revisa solo las celdas
+    que alcanza el radio máximo registrado, en vez de recorrer todos los puntos.
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._points = {}
+        self._max_radius_m = 0.0
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def __len__(self):
+        return len(self._points)
+
+    def upsert(self, key, lat, lon, radius_m):
+        with self._lock:
+            self._remove(key)
+            cell = self._cell(lat, lon)
+            self._points[key] = (lat, lon, radius_m, cell)
+            self._cells.setdefault(cell, {})[key] = (lat, lon, radius_m)
+            self._max_radius_m = max(self._max_radius_m, radius_m)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        old = self._points.pop(key, None)
+        if old:
+            bucket = self._cells.get(old[3])
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[old[3]]
+
+    def query(self, lat, lon):
+        """Claves cuyos círculos (ubicación + radio propio) contienen el punto (lat, lon)."""
+        with self._lock:
+            if not self._points:
+                return []
+            reach_lat = math.ceil(self._max_radius_m / 111320.0 / self.cell_deg)
+            cos_lat = max(math.cos(math.radians(lat)), 0.01)
+            reach_lon = math.ceil(self._max_radius_m / (111320.0 * cos_lat) / self.cell_deg)
+            cy, cx = self._cell(lat, lon)
+
+            found = []
+            for dy in range(-reach_lat, reach_lat + 1):
+                for dx in range(-reach_lon, reach_lon + 1):
+                    bucket = self._cells.get((cy + dy, cx + dx))
+                    if not bucket:
+                        continue
+                    for key, (plat, plon, radius_m) in bucket.items():
+                        if distance_m(lat, lon, plat, plon) <= radius_m:
+                            found.append(key)
+            return found
+
+
+class RecentIndex:
+    """
+    Índice espacio-temporal de incidentes recientes por categoría.
+    Cada celda (categoría, fila, columna) guarda una deque en orden de llegada;
+    las entradas más viejas que la ventana se descartan por la izquierda, así
+    una consulta solo toca unas pocas celdas vecinas con pocos elementos.
+    """
+
+    def __init__(self, radius_m, window_s, cell_deg=None):
+        self.radius_m = radius_m
+        self.window_s = window_s
+        # Celda de al menos el radio: basta con mirar la celda y sus 8 vecinas
+        self.cell_deg = cell_deg or max(radius_m / 111320.0, 0.0005)
+        self._cells = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, category, lat, lon):
+        return (category, math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def add(self, incident_id, category, lat, lon, ts):
+        with self._lock:
+            cell = self._cell(category, lat, lon)
+            entry = [ts, lat, lon, incident_id, True]
+            self._cells.setdefault(cell, deque()).append(entry)
+            self._by_id[incident_id] = entry
+
+    def remove(self, incident_id):
+        """Deja de considerar un incidente (p. ej. al resolverlo)."""
+        with self._lock:
+            entry = self._by_id.pop(incident_id, None)
+            if entry:
+                entry[4] = False
+
+    def find(self, category, lat, lon, now):
+        """ID del incidente activo más cercano de la misma categoría dentro del radio y la ventana, o None."""
+        with self._lock:
+            cutoff = now - self.window_s
+            cat, cy, cx = self._cell(category, lat, lon)
+            cos_lat = max(math.cos(math.radians(lat)), 0.01)
+            reach_lon = math.ceil(1 / cos_lat)
+
+            best, best_d = None, self.radius_m
+            for dy in (-1, 0, 1):
+                for dx in range(-reach_lon, reach_lon + 1):
+                    key = (cat, cy + dy, cx + dx)
+                    bucket = self._cells.get(key)
+                    if not bucket:
+                        continue
+                    while bucket and bucket[0][0] < cutoff:
+                        old = bucket.popleft()
+                        if self._by_id.get(old[3]) is old:
+                            del self._by_id[old[3]]
+                    if not bucket:
+                        del self._cells[key]
+                        continue
+                    for ts, plat, plon, incident_id, alive in bucket:
+                        if not alive or ts > now:
+                            continue
+                        d = distance_m(lat, lon, plat, plon)
+                        if d <= best_d:
+                            best, best_d = incident_id, d
+            return best
+
+
+# === Benchmark de la búsqueda de duplicados ===
+def benchmark_recent_index(n=50000, queries=20000):
+    import random
+    import time
+
+    rnd = random.Random(1)
+    index = RecentIndex(radius_m=150, window_s=1800)
+    now = time.time()
+    cats = ["Robo", "Acoso", "Vandalismo", "Emergencia", "Otro"]
+    for i in range(n):
+        index.add(f"inc{i}", rnd.choice(cats), -12.0 - rnd.random() * 0.2, -77.0 - rnd.random() * 0.2,
+                  now - rnd.random() * 1800)
+
+    t0 = time.perf_counter()
+    hits = 0
+    for _ in range(queries):
+        if index.find(rnd.choice(cats), -12.0 - rnd.random() * 0.2, -77.0 - rnd.random() * 0.2, now):
+            hits += 1
+    elapsed = time.perf_counter() - t0
+    print(f"{n} incidentes recientes | {queries} consultas | {elapsed / queries * 1e6:.1f} µs/consulta | {hits} coincidencias")
+
+
+if __name__ == "__main__":
+    benchmark_recent_index()
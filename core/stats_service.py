@@ -1,7 +1,7 @@
 # core/stats_service.py
 from data import repository_firebase as repository
 from collections import Counter
-from datetime import datetime
+from datetime import datetime, timezone
 
 def parse_date(value):
     """Convierte diferentes formatos de fecha a datetime."""
@@ -19,56 +19,83 @@ def parse_date(value):
         except Exception:
             return None
 
-def get_statistics(year=None, month=None, status=None):
-    incidents = repository.get_all_incidents()
+def empty_statistics():
+    """Estructura de estadísticas sin datos."""
+    return {
+        "daily": {"labels": [], "data": []},
+        "categories": {"labels": [], "data": []},
+        "status": {"labels": [], "data": []},
+        "hourly": [0] * 24,
+    }
+
+
+def period_range(year=None, month=None):
+    """
+    Rango [inicio, fin) en UTC para un año y mes opcionales.
+    Sin año el rango es abierto (None, None), es decir, todo el histórico.
+    """
+    if not year:
+        return None, None
+    year = int(year)
+    if month:
+        month = int(month)
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + (month == 12), month % 12 + 1, 1, tzinfo=timezone.utc)
+    else:
+        start = datetime(year, 1, 1, tzinfo=timezone.utc)
+        end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def get_period_incidents(year=None, month=None, status=None, district=None):
+    """
+    Incidentes (modelos Incident) del periodo pedido. Incluye las particiones del archivo
+    que el rango cubra; el archivo solo guarda incidentes resueltos, así que se omite al filtrar por 'open'.
+    """
+    start, end = period_range(year, month)
+    return repository.get_incident_models_in_range(start, end, include_archive=status != "open", district=district)
+
+
+def get_statistics(year=None, month=None, status=None, district=None):
+    incidents = get_period_incidents(year, month, status, district)
     filtered = []
 
     for inc in incidents:
-        try:
-            dt = parse_date(inc.get("created_at"))
-            if not dt:
-                continue
-
-            if year and dt.year != int(year):
-                continue
-            if month and dt.month != int(month):
-                continue
-            if status and inc.get("status") != status:
-                continue
-
-            filtered.append(inc)
-        except Exception:
+        dt = inc.created_at or parse_date(inc.created_at_iso)
+        if not dt:
+            continue
+
+        if year and dt.year != int(year):
             continue
+        if month and dt.month != int(month):
+            continue
+        if status and inc.status != status:
+            continue
+
+        filtered.append((inc, dt))
 
     if not filtered:
-        return {
-            "daily": {"labels": [], "data": []},
-            "categories": {"labels": [], "data": []},
-            "status": {"labels": [], "data": []},
-            "hourly": [0] * 24,
-        }
+        return empty_statistics()
 
     # 1️⃣ Por día
-    daily_counts = Counter([parse_date(i.get("created_at")).day for i in filtered if parse_date(i.get("created_at"))])
+    daily_counts = Counter(dt.day for _, dt in filtered)
     daily = {
         "labels": [str(d) for d in sorted(daily_counts.keys())],
         "data": [daily_counts[d] for d in sorted(daily_counts.keys())],
     }
 
     # 2️⃣ Por categoría
-    cat_counts = Counter([i.get("category", "Desconocido") for i in filtered])
+    cat_counts = Counter(i.raw_category or "Desconocido" for i, _ in filtered)
     categories = {"labels": list(cat_counts.keys()), "data": list(cat_counts.values())}
 
     # 3️⃣ Por estado
-    status_counts = Counter([i.get("status", "open") for i in filtered])
+    status_counts = Counter(i.status for i, _ in filtered)
     status_stats = {"labels": list(status_counts.keys()), "data": list(status_counts.values())}
 
     # 4️⃣ Por hora
     hourly_counts = [0] * 24
-    for i in filtered:
-        dt = parse_date(i.get("created_at"))
-        if dt:
-            hourly_counts[dt.hour] += 1
+    for _, dt in filtered:
+        hourly_counts[dt.hour] += 1
 
     return {
         "daily": daily,
@@ -0,0 +1,298 @@
+# data/bot_persistence.py
+"""
+Persistencia del estado de conversación del bot (context.user_data) en SQLite.
+
+- Carga perezosa: no se lee nada al arrancar; cada usuario se carga de disco
+  la primera vez que llega un update suyo (refresh_user_data).
+- Escrituras mínimas: solo se guardan los usuarios cuyo estado cambió desde la
+  última escritura, agrupados en una sola transacción por ciclo de persistencia.
+  Un estado vacío (conversación terminada) borra la fila.
+- Expiración: las conversaciones sin actividad durante CONVERSATION_TTL_HOURS se
+  descartan, tanto en memoria como en disco.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from telegram.ext import BasePersistence, PersistenceInput
+
+load_dotenv()
+
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "bot_state.sqlite3")
+CONVERSATION_TTL_HOURS = float(os.getenv("CONVERSATION_TTL_HOURS", "24"))
+CONVERSATION_FLUSH_S = float(os.getenv("CONVERSATION_FLUSH_S", "5"))
+PURGE_EVERY_S = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations(updated_at);
+"""
+
+
+def _encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=str)
+
+
+class SQLitePersistence(BasePersistence):
+    """Backend de persistencia de python-telegram-bot que solo guarda user_data."""
+
+    def __init__(self, path=CONVERSATION_DB, ttl_hours=CONVERSATION_TTL_HOURS, update_interval=CONVERSATION_FLUSH_S):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self.ttl_s = ttl_hours * 3600
+        # Una conexión para escribir (hilo de escritura) y otra para las lecturas puntuales;
+        # con WAL las lecturas no esperan a una transacción de escritura en curso.
+        self._write_conn = self._connect()
+        self._write_conn.executescript(_SCHEMA)
+        self._read_conn = self._connect()
+        self._write_lock = threading.Lock()     # conexión de escritura y transacción en curso
+        self._read_lock = threading.Lock()
+        # _dirty lo modifica el hilo del event loop y lo vacía el hilo de escritura
+        self._dirty_lock = threading.Lock()
+
+        self._loaded = set()        # usuarios ya cargados de disco en esta ejecución
+        self._last_seen = {}        # user_id -> último update (monotónico)
+        self._written = {}          # user_id -> JSON de la última versión escrita
+        self._dirty = {}            # user_id -> JSON pendiente ('' = borrar)
+        self._write_task = None
+        self._last_purge = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # === Carga perezosa ===
+    async def get_user_data(self):
+        # Al arrancar no se carga nada: cada usuario se lee en su primer update
+        return {}
+
+    def _load(self, user_id):
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT data, updated_at FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if not row:
+            return None
+        if time.time() - row[1] > self.ttl_s:
+            with self._dirty_lock:
+                self._dirty[user_id] = ""
+            return None
+        self._written[user_id] = row[0]
+        return json.loads(row[0])
+
+    async def refresh_user_data(self, user_id, user_data):
+        now = time.monotonic()
+        last = self._last_seen.get(user_id)
+        self._last_seen[user_id] = now
+
+        if user_id not in self._loaded:
+            self._loaded.add(user_id)
+            stored = self._load(user_id)
+            # Si quedaba algo en memoria es de una conversación ya expirada y purgada
+            user_data.clear()
+            if stored:
+                user_data.update(stored)
+        elif last is not None and user_data and now - last > self.ttl_s:
+            # Conversación abandonada en memoria: se empieza de cero
+            user_data.clear()
+
+    # === Escritura de usuarios modificados ===
+    async def update_user_data(self, user_id, data):
+        encoded = _encode(data) if data else ""
+        with self._dirty_lock:
+            if encoded == self._written.get(user_id, ""):
+                self._dirty.pop(user_id, None)
+                return
+            self._dirty[user_id] = encoded
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id):
+        with self._dirty_lock:
+            self._dirty[user_id] = ""
+        self._last_seen.pop(user_id, None)
+        self._schedule_write()
+
+    def _schedule_write(self):
+        # Application llama a update_user_data para todos los usuarios del ciclo en el mismo
+        # gather; la escritura se agenda después, así el ciclo completo va en una transacción.
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.get_running_loop().create_task(self._write_soon())
+
+    async def _write_soon(self):
+        await asyncio.sleep(0)
+        await asyncio.to_thread(self.write_pending)
+
+    def write_pending(self):
+        """Escribe en una transacción todos los usuarios pendientes. Devuelve cuántos."""
+        with self._write_lock:
+            with self._dirty_lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                self._maybe_purge()
+                return 0
+            now = time.time()
+            upserts = [(uid, data, now) for uid, data in pending.items() if data]
+            deletes = [(uid,) for uid, data in pending.items() if not data]
+            conn = self._write_conn
+            try:
+                conn.execute("BEGIN")
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO conversations(user_id, data, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM conversations WHERE user_id = ?", deletes)
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Se reintenta en el próximo ciclo sin pisar cambios más nuevos
+                with self._dirty_lock:
+                    for uid, data in pending.items():
+                        self._dirty.setdefault(uid, data)
+                print("⚠️ No se pudo guardar el estado de conversación:", e)
+                return 0
+
+            with self._dirty_lock:
+                for uid, data in pending.items():
+                    if data:
+                        self._written[uid] = data
+                    else:
+                        self._written.pop(uid, None)
+            self._maybe_purge()
+            return len(pending)
+
+    # === Expiración ===
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_EVERY_S:
+            return
+        self._last_purge = now
+        self.purge_expired()
+
+    def purge_expired(self):
+        """Borra de disco las conversaciones abandonadas y olvida las cacheadas en memoria."""
+        cutoff = time.time() - self.ttl_s
+        removed = self._write_conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+        idle = time.monotonic() - self.ttl_s
+        for uid in [uid for uid, seen in list(self._last_seen.items()) if seen < idle]:
+            self._last_seen.pop(uid, None)
+            self._written.pop(uid, None)
+            self._loaded.discard(uid)
+        if removed:
+            print(f"🧹 {removed} conversaciones abandonadas eliminadas")
+        return removed
+
+    async def flush(self):
+        if self._write_task is not None:
+            await self._write_task
+        await asyncio.to_thread(self.write_pending)
+
+    # === Datos que no se persisten ===
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+
+# === Benchmark con 100k conversaciones guardadas ===
+def benchmark_persistence(n=100000, changed=2000, lookups=20000):
+    import random
+    import tempfile
+
+    async def run():
+        rnd = random.Random(37)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            p = SQLitePersistence(path)
+
+            def state(uid):
+                return {"modo": "esperando_categoria", "lat": -12.0 - rnd.random() * 0.1, "lon": -77.0 - rnd.random() * 0.1,
+                        "mensaje_incidente": f"Reporte de prueba del vecino {uid} " + "x" * 60}
+
+            t0 = time.perf_counter()
+            for uid in range(n):
+                await p.update_user_data(uid, state(uid))
+            await p.flush()
+            print(f"Escritura inicial: {n} conversaciones en {time.perf_counter() - t0:.2f}s "
+                  f"| archivo {os.path.getsize(path) / 1e6:.1f} MB")
+
+            t0 = time.perf_counter()
+            p2 = SQLitePersistence(path)
+            await p2.get_user_data()
+            print(f"Arranque (carga perezosa): {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+            uids = [rnd.randrange(n) for _ in range(lookups)]
+            samples = []
+            for uid in uids:
+                t = time.perf_counter()
+                await p2.refresh_user_data(uid, {})
+                samples.append(time.perf_counter() - t)
+            samples.sort()
+            print(f"Primer update por usuario: p50 {samples[len(samples) // 2] * 1e6:.0f} µs "
+                  f"| p99 {samples[int(len(samples) * 0.99)] * 1e6:.0f} µs")
+
+            # Ciclo típico: muchos usuarios tocados, pocos con cambios reales
+            touched = {uid: json.loads(p2._written[uid]) for uid in set(uids)}
+            for uid in list(touched)[:changed]:
+                touched[uid]["modo"] = "esperando_feedback"
+            t0 = time.perf_counter()
+            for uid, data in touched.items():
+                await p2.update_user_data(uid, data)
+            dirty = len(p2._dirty)
+            written = await asyncio.to_thread(p2.write_pending)
+            print(f"Ciclo de persistencia: {len(touched)} usuarios tocados → {dirty} sucios, "
+                  f"{written} escritos en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+            t0 = time.perf_counter()
+            p2.ttl_s = 0
+            removed = p2.purge_expired()
+            print(f"Expiración: {removed} filas en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    benchmark_persistence()
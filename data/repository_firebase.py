@@ -1,5 +1,16 @@
+import os
+import threading
 from .firebase_connection import db
 from google.cloud import firestore
+from google.api_core.exceptions import NotFound
+from core.circuit_breaker import get_breaker
+from core.models import Incident
+from core.profiling import span, traced
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+
+FIRESTORE_TIMEOUT = float(os.getenv("FIRESTORE_TIMEOUT", "5"))
+SCAN_PAGE_SIZE = int(os.getenv("FIRESTORE_SCAN_PAGE_SIZE", "1000"))
 
 _emit_callback = None
 
@@ -14,7 +25,17 @@ def _maybe_emit(name, payload):
         except Exception as e:
             print("⚠️ Error al emitir evento:", e)
 
+def _read(fn, *args, **kwargs):
+    """
+    Lectura a Firestore protegida por el circuit breaker 'firestore' (timeout + fallo rápido).
+    La función debe pasar timeout=FIRESTORE_TIMEOUT a sus llamadas al SDK: el breaker deja de
+    esperar, pero solo el timeout del SDK libera el worker del pool.
+    """
+    with span("firestore"):
+        return get_breaker("firestore").call(fn, *args, **kwargs)
+
 # === Usuarios ===
+@traced("firestore")
 def register_user(telegram_id, username, full_name, dni, phone_number):
     ref = db.collection("users").document(str(telegram_id))
     ref.set({
@@ -27,12 +48,31 @@ def register_user(telegram_id, username, full_name, dni, phone_number):
     print(f"✅ Usuario {full_name or username} registrado correctamente.")
 
 def get_user(telegram_id):
-    doc = db.collection("users").document(str(telegram_id)).get()
+    doc = _read(db.collection("users").document(str(telegram_id)).get, timeout=FIRESTORE_TIMEOUT)
     return doc.to_dict() if doc.exists else None
 
 
+@traced("firestore")
+def set_alert_subscription(telegram_id, lat, lon, radius_m):
+    """Guarda (o desactiva con radius_m=0) la suscripción a alertas cercanas del usuario."""
+    ref = db.collection("users").document(str(telegram_id))
+    ref.set({
+        "telegram_id": telegram_id,
+        "alert_lat": lat,
+        "alert_lon": lon,
+        "alert_radius_m": radius_m
+    }, merge=True)
+
+
+def get_alert_subscribers():
+    """Usuarios con alertas activas: [{'telegram_id', 'alert_lat', 'alert_lon', 'alert_radius_m'}]."""
+    docs = db.collection("users").where("alert_radius_m", ">", 0).stream()
+    return [d.to_dict() for d in docs]
+
+
 # === Incidentes ===
-def create_incident(user_id, username, message, address, lat, lon, category):
+@traced("firestore")
+def create_incident(user_id, username, message, address, lat, lon, category, media=None, district=None):
     user_doc = db.collection("users").document(str(user_id)).get()
     user = user_doc.to_dict() if user_doc.exists else {}
 
@@ -51,10 +91,17 @@ def create_incident(user_id, username, message, address, lat, lon, category):
         "created_at": firestore.SERVER_TIMESTAMP,
         "reporter_name": user.get("full_name", username),
         "reporter_dni": user.get("dni"),
-        "reporter_phone": user.get("phone_number")
+        "reporter_phone": user.get("phone_number"),
+        "district": district
     }
+    if media:
+        # Solo referencias al almacenamiento de objetos, nunca el contenido
+        incident_data["media"] = list(media)
 
     incident_ref.set(incident_data)
+    # El centinela SERVER_TIMESTAMP solo sirve para el set(); el evento y el llamador
+    # reciben una fecha real (la que Firestore resolverá será prácticamente la misma)
+    incident_data = dict(incident_data, created_at=datetime.now(timezone.utc))
     _maybe_emit("new_incident", incident_data)
     print(f"🚨 Nuevo incidente registrado por {username}: {category}")
     return incident_data
@@ -63,37 +110,393 @@ def create_incident(user_id, username, message, address, lat, lon, category):
 register_incident = create_incident
 
 
-def get_all_incidents():
-    docs = db.collection("incidents").order_by("created_at", direction=firestore.Query.DESCENDING).stream()
-    return [d.to_dict() for d in docs]
-
-
-def update_incident_status(incident_id, status):
+@traced("firestore")
+def add_corroboration(incident_id, user_id, username, message, media=None):
+    """
+    Añade un reporte corroborante a un incidente existente (mismo hecho reportado
+    por otro vecino) en lugar de crear un documento nuevo.
+    """
     ref = db.collection("incidents").document(str(incident_id))
-    ref.update({"status": status})
-    doc = ref.get()
-    incident = doc.to_dict()
+    report = {
+        "user_id": user_id,
+        "username": username,
+        "message": message,
+        "created_at": datetime.now(timezone.utc),
+    }
+    if media:
+        report["media"] = list(media)
+    ref.update({
+        "corroborations": firestore.ArrayUnion([report]),
+        "reporter_ids": firestore.ArrayUnion([user_id]),
+        "corroboration_count": firestore.Increment(1),
+    })
+    incident = ref.get().to_dict()
     _maybe_emit("update_incident", incident)
+    # El reporte adicional como evento propio (p. ej. para el detector de zonas calientes)
+    _maybe_emit("new_corroboration", {
+        "id": incident_id,
+        "user_id": user_id,
+        "category": incident.get("category"),
+        "lat": incident.get("lat"),
+        "lon": incident.get("lon"),
+        "district": incident.get("district"),
+        "created_at": report["created_at"],
+    })
+    print(f"🤝 Reporte de {username} añadido como corroboración del incidente {incident_id}")
     return incident
 
 
+def get_all_incidents(include_archive=False, district=None):
+    """
+    Incidentes del conjunto activo (hot). Con include_archive=True suma también el archivo.
+    Con `district` solo los de esa jurisdicción (índice compuesto district + created_at).
+    """
+    if include_archive:
+        return get_incidents_in_range(district=district)
+    return _read(_load_hot_incidents, _snapshot_dict, district)
+
+
+def get_incidents_in_range(start=None, end=None, include_archive=True, district=None):
+    """
+    Incidentes con start <= created_at < end (None = sin límite), ordenados del más reciente al más antiguo.
+    Consulta el conjunto activo y, si el rango las cubre, las particiones mensuales del archivo.
+    """
+    return _read(_load_incidents_in_range, start, end, include_archive, _snapshot_dict, district)
+
+
+# --- Modelos Incident (una sola normalización por versión del documento) ---
+MODEL_CACHE_MAX = 200000
+_model_cache = OrderedDict()    # LRU: doc.id -> (update_time, Incident)
+_model_cache_lock = threading.Lock()
+
+
+def get_incident_models(include_archive=False, district=None):
+    """Como get_all_incidents, pero devuelve objetos Incident."""
+    if include_archive:
+        return get_incident_models_in_range(district=district)
+    return _read(_load_hot_incidents, _snapshot_model, district)
+
+
+def get_incident_models_in_range(start=None, end=None, include_archive=True, district=None):
+    """Como get_incidents_in_range, pero devuelve objetos Incident."""
+    return _read(_load_incidents_in_range, start, end, include_archive, _snapshot_model, district)
+
+
+def _snapshot_dict(doc):
+    return doc.to_dict()
+
+
+def _snapshot_model(doc):
+    """
+    Convierte un snapshot en Incident reutilizando el modelo ya construido si el
+    documento no cambió (mismo update_time), junto con sus vistas cacheadas.
+    """
+    update_time = getattr(doc, "update_time", None)
+    with _model_cache_lock:
+        cached = _model_cache.get(doc.id)
+        if cached is not None and update_time is not None and cached[0] == update_time:
+            _model_cache.move_to_end(doc.id)
+            return cached[1]
+    data = doc.to_dict()
+    if not data:
+        return None
+    model = Incident.from_dict(data)
+    with _model_cache_lock:
+        _model_cache[doc.id] = (update_time, model)
+        _model_cache.move_to_end(doc.id)
+        # Se descartan solo los menos usados (p. ej. documentos archivados o borrados)
+        while len(_model_cache) > MODEL_CACHE_MAX:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def _load_hot_incidents(convert, district=None):
+    query = db.collection("incidents")
+    if district:
+        query = query.where("district", "==", district)
+    docs = query.order_by("created_at", direction=firestore.Query.DESCENDING).stream(timeout=FIRESTORE_TIMEOUT)
+    return [x for x in map(convert, docs) if x]
+
+
+def _load_incidents_in_range(start, end, include_archive, convert, district=None):
+    query = db.collection("incidents")
+    if district:
+        query = query.where("district", "==", district)
+    if start:
+        query = query.where("created_at", ">=", start)
+    if end:
+        query = query.where("created_at", "<", end)
+    docs = query.order_by("created_at", direction=firestore.Query.DESCENDING).stream(timeout=FIRESTORE_TIMEOUT)
+    incidents = [x for x in map(convert, docs) if x]
+
+    if include_archive:
+        for month_key in list_archive_partitions(start, end):
+            part = _archive_partition(month_key).collection("incidents")
+            if district:
+                part = part.where("district", "==", district)
+            if start:
+                part = part.where("created_at", ">=", start)
+            if end:
+                part = part.where("created_at", "<", end)
+            incidents.extend(x for x in map(convert, part.stream(timeout=FIRESTORE_TIMEOUT)) if x)
+        incidents.sort(key=_created_at_sort_key, reverse=True)
+
+    return incidents
+
+
+def iter_incident_pages(start=None, include_archive=True, page_size=SCAN_PAGE_SIZE):
+    """
+    Recorre el conjunto activo y (si se pide) las particiones del archivo en páginas de
+    `page_size` incidentes, de más antiguo a más reciente dentro de cada colección.
+    Pensado para las reconstrucciones de fondo (índices, detectores): no pasa por el
+    circuit breaker, cada página es una consulta corta con su propio timeout y un fallo
+    solo lanza la excepción al llamador, que decide si reintentar.
+    """
+    sources = [db.collection("incidents")]
+    if include_archive:
+        sources += [_archive_partition(k).collection("incidents") for k in list_archive_partitions(start)]
+    for col in sources:
+        query = col.where("created_at", ">=", start) if start else col
+        query = query.order_by("created_at").limit(page_size)
+        last = None
+        while True:
+            page = query.start_after(last) if last is not None else query
+            docs = list(page.stream(timeout=FIRESTORE_TIMEOUT))
+            if not docs:
+                break
+            items = [x for x in map(_snapshot_dict, docs) if x]
+            if items:
+                yield items
+            if len(docs) < page_size:
+                break
+            last = docs[-1]
+
+
+def _created_at_sort_key(inc):
+    dt = inc.created_at if isinstance(inc, Incident) else inc.get("created_at")
+    return dt.timestamp() if isinstance(dt, datetime) else 0
+
+
+def _find_incident(incident_id):
+    """
+    Snapshot del incidente en el conjunto activo o, si ya se archivó, en su partición
+    del archivo (de la más reciente a la más antigua). None si no existe.
+    """
+    doc = db.collection("incidents").document(str(incident_id)).get(timeout=FIRESTORE_TIMEOUT)
+    if doc.exists:
+        return doc
+    for month_key in reversed(list_archive_partitions()):
+        ref = _archive_partition(month_key).collection("incidents").document(str(incident_id))
+        doc = ref.get(timeout=FIRESTORE_TIMEOUT)
+        if doc.exists:
+            return doc
+    return None
+
+
+def _update_incident(incident_id, fields_for):
+    """
+    Actualiza el incidente esté donde esté (activo o archivado) y emite 'update_incident'.
+    `fields_for(datos_actuales)` devuelve los campos a escribir. Retorna el incidente
+    actualizado, o None si no existe.
+    """
+    # Dos intentos: el archivado puede mover el documento entre la lectura y la escritura
+    for _ in range(2):
+        doc = _find_incident(incident_id)
+        if doc is None:
+            return None
+        try:
+            doc.reference.update(fields_for(doc.to_dict()))
+        except NotFound:
+            continue
+        incident = doc.reference.get(timeout=FIRESTORE_TIMEOUT).to_dict()
+        _maybe_emit("update_incident", incident)
+        return incident
+    return None
+
+
+@traced("firestore")
+def update_incident_status(incident_id, status):
+    """Cambia el estado. Al pasar a 'resolved' se guarda resolved_at (base del archivado)."""
+    def fields(current):
+        data = {"status": status}
+        if current.get("status") != status:
+            data["resolved_at"] = firestore.SERVER_TIMESTAMP if status == "resolved" else None
+        return data
+    return _update_incident(incident_id, fields)
+
+
+@traced("firestore")
 def set_incident_response(incident_id, message):
-    ref = db.collection("incidents").document(str(incident_id))
-    ref.update({"response": message})
-    doc = ref.get()
-    incident = doc.to_dict()
-    _maybe_emit("update_incident", incident)
-    return incident
+    return _update_incident(incident_id, lambda current: {"response": message})
+
+
+# === Escritura masiva (importación histórica) ===
+def incident_doc_ref(incident_id=None):
+    """Referencia a un documento de incidente (con ID fijo si se indica)."""
+    col = db.collection("incidents")
+    return col.document(str(incident_id)) if incident_id else col.document()
+
+
+def bulk_writer():
+    """Crea un BulkWriter de Firestore para importaciones masivas."""
+    return db.bulk_writer()
+
+
+# === Archivo: particiones mensuales incidents_archive/{yyyy-mm} ===
+ARCHIVE_COLLECTION = "incidents_archive"
+
+
+def _archive_partition(month_key):
+    return db.collection(ARCHIVE_COLLECTION).document(month_key)
+
+
+def list_archive_partitions(start=None, end=None):
+    """Claves yyyy-mm de las particiones de archivo que se solapan con [start, end)."""
+    first = start.strftime("%Y-%m") if start else None
+    last = (end - timedelta(microseconds=1)).strftime("%Y-%m") if end else None
+    keys = []
+    for ref in db.collection(ARCHIVE_COLLECTION).list_documents(timeout=FIRESTORE_TIMEOUT):
+        key = ref.id
+        if (first and key < first) or (last and key > last):
+            continue
+        keys.append(key)
+    return sorted(keys)
+
+
+def get_archive_summaries():
+    """Resumen compacto de cada partición (total y conteo por categoría)."""
+    return {d.id: d.to_dict() for d in db.collection(ARCHIVE_COLLECTION).stream(timeout=FIRESTORE_TIMEOUT)}
+
+
+def _stamp_legacy_resolved(cutoff, page_size):
+    """
+    Incidentes resueltos antes de que existiera resolved_at: no se sabe cuándo se
+    resolvieron, así que se les pone la fecha de hoy y el plazo de archivado empieza ahora.
+    Solo hace falta mirar los creados antes del corte (los demás aún no pueden archivarse).
+    Requiere el índice compuesto (status, created_at). Retorna cuántos se marcaron.
+    """
+    query = (
+        db.collection("incidents")
+        .where("status", "==", "resolved")
+        .where("created_at", "<", cutoff)
+        .order_by("created_at")
+        .limit(page_size)
+    )
+    stamped, last = 0, None
+    while True:
+        docs = list((query.start_after(last) if last is not None else query).stream(timeout=FIRESTORE_TIMEOUT))
+        if not docs:
+            break
+        batch = db.batch()
+        legacy = [doc for doc in docs if not doc.get("resolved_at")]
+        for doc in legacy:
+            batch.set(doc.reference, {"resolved_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        if legacy:
+            batch.commit()
+            stamped += len(legacy)
+        if len(docs) < page_size:
+            break
+        last = docs[-1]
+    return stamped
+
+
+def archive_resolved_incidents(older_than_days, page_size=200):
+    """
+    Mueve al archivo mensual (partición según created_at) los incidentes que llevan más de
+    `older_than_days` días resueltos, y actualiza el resumen de cada partición.
+    Requiere el índice compuesto (status, resolved_at).
+    Retorna: {'yyyy-mm': nº de incidentes movidos}
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    moved = Counter()
+
+    stamped = _stamp_legacy_resolved(cutoff, page_size)
+    if stamped:
+        print(f"🕒 {stamped} incidentes resueltos sin resolved_at: se archivarán dentro de {older_than_days} días")
+
+    while True:
+        docs = list(
+            db.collection("incidents")
+            .where("status", "==", "resolved")
+            .where("resolved_at", "<", cutoff)
+            .limit(page_size)
+            .stream(timeout=FIRESTORE_TIMEOUT)
+        )
+        if not docs:
+            break
+
+        batch = db.batch()
+        summaries = {}
+        for doc in docs:
+            inc = doc.to_dict()
+            dt = inc.get("created_at")
+            if not isinstance(dt, datetime):
+                # Sin fecha de creación utilizable: se archiva en el mes en que se resolvió
+                # (si se saltara, la misma página volvería a salir en cada vuelta)
+                dt = inc["resolved_at"]
+            month_key = dt.strftime("%Y-%m")
+            batch.set(_archive_partition(month_key).collection("incidents").document(doc.id), inc)
+            batch.delete(doc.reference)
+
+            summary = summaries.setdefault(month_key, {"count": 0, "by_category": Counter()})
+            summary["count"] += 1
+            summary["by_category"][inc.get("category") or "Desconocido"] += 1
+
+        for month_key, summary in summaries.items():
+            batch.set(_archive_partition(month_key), {
+                "count": firestore.Increment(summary["count"]),
+                "by_category": {c: firestore.Increment(n) for c, n in summary["by_category"].items()},
+                "archived_at": firestore.SERVER_TIMESTAMP,
+            }, merge=True)
+            moved[month_key] += summary["count"]
+        batch.commit()
+
+        if len(docs) < page_size:
+            break
+
+    for month_key, n in sorted(moved.items()):
+        print(f"🗄️ Archivados {n} incidentes en {ARCHIVE_COLLECTION}/{month_key}")
+    return dict(moved)
 
 
 # === Feedback ===
+def get_feedback_map():
+    """Feedback indexado por incidente: {incident_id: {'rating': int, 'comment': str}}"""
+    return _read(_load_feedback_map)
+
+
+def _load_feedback_map():
+    feedback_map = {}
+    for fb in db.collection("feedback").stream(timeout=FIRESTORE_TIMEOUT):
+        data = fb.to_dict()
+        if not data:
+            continue
+        incident_id = data.get("incident_id")
+        # Solo el documento del reportante original (feedback/{incident_id}); los de
+        # vecinos que corroboraron (feedback/{incident_id}_{user_id}) no lo pisan.
+        if incident_id and fb.id == str(incident_id) and not data.get("corroborator"):
+            feedback_map[incident_id] = {
+                "rating": data.get("rating", 0),
+                "comment": data.get("comment", "")
+            }
+    return feedback_map
+
+@traced("firestore")
 def save_feedback(user_id, incident_id, rating=None, comment=None):
-    ref = db.collection("feedback").document(str(incident_id))
     data = {
         "user_id": user_id,
         "incident_id": incident_id,
         "created_at": firestore.SERVER_TIMESTAMP
     }
+    incident_doc = db.collection("incidents").document(str(incident_id)).get()
+    incident = incident_doc.to_dict() if incident_doc.exists else {}
+    reporter_id = incident.get("user_id")
+    if reporter_id is not None and str(reporter_id) != str(user_id):
+        # Vecino que corroboró el mismo incidente: su propio documento, marcado como tal
+        ref = db.collection("feedback").document(f"{incident_id}_{user_id}")
+        data["corroborator"] = True
+    else:
+        ref = db.collection("feedback").document(str(incident_id))
     if rating is not None:
         data["rating"] = rating
     if comment is not None:
@@ -101,6 +504,7 @@ def save_feedback(user_id, incident_id, rating=None, comment=None):
 
     ref.set(data, merge=True)
     fb = ref.get().to_dict()
-    _maybe_emit("new_feedback", fb)
+    # Con el distrito del incidente el evento llega también a la sala de ese distrito
+    _maybe_emit("new_feedback", dict(fb, district=incident.get("district")))
     print(f"💬 Feedback guardado correctamente: incidente={incident_id}, rating={rating}")
     return fb
@@ -0,0 +1,182 @@
+# import_incidents.py
+"""
+Importación masiva de reportes históricos (CSV o JSONL) a Firestore.
+
+Uso:
+    python import_incidents.py reportes.csv
+    python import_incidents.py reportes.jsonl --workers 16 --batch 1000
+
+- Geocodifica en paralelo (pool acotado + caché) las filas sin lat/lon.
+- Escribe con BulkWriter y guarda un checkpoint tras cada lote, así una
+  ejecución interrumpida continúa donde quedó al relanzar el mismo comando.
+- Los IDs de documento son deterministas (archivo + nº de fila), por lo que
+  reescribir un lote ya enviado no duplica incidentes.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from core.geolocalizador import geocode_address
+from core.districts import assign_district
+from core.stats_service import parse_date
+from data import repository_firebase as repository
+
+
+INCIDENT_FIELDS = (
+    "user_id", "username", "message", "address", "category",
+    "status", "response", "reporter_name", "reporter_dni", "reporter_phone",
+)
+
+
+# ==========================
+# 📥 Lectura de filas
+# ==========================
+def read_rows(path, fmt):
+    """Genera diccionarios fila a fila sin cargar el archivo completo."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def _to_float(v):
+    try:
+        return float(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def row_to_incident(row, source, row_number, default_status):
+    """Convierte una fila del archivo al mismo formato que create_incident."""
+    incident_id = row.get("id") or hashlib.sha1(f"{source}:{row_number}".encode()).hexdigest()[:20]
+    data = {k: (row.get(k) or None) for k in INCIDENT_FIELDS}
+    data.update({
+        "id": str(incident_id),
+        "lat": _to_float(row.get("lat")),
+        "lon": _to_float(row.get("lon")),
+        "category": data["category"] or "Otro",
+        "status": data["status"] or default_status,
+        "response": data["response"] or "",
+        "created_at": parse_date(row.get("created_at")),
+        "reporter_name": data["reporter_name"] or data["username"],
+        "district": row.get("district") or None,
+        "source": "import",
+    })
+    return data
+
+
+def geocode_missing(incidents, pool):
+    """Rellena lat/lon de las filas que solo traen dirección (una consulta por dirección única)."""
+    pending = {i["address"] for i in incidents if i["address"] and (i["lat"] is None or i["lon"] is None)}
+    if not pending:
+        return 0
+    pending = list(pending)
+    results = dict(zip(pending, pool.map(geocode_address, pending)))
+    for inc in incidents:
+        if inc["lat"] is None or inc["lon"] is None:
+            geo = results.get(inc["address"])
+            if geo:
+                inc["lat"], inc["lon"] = geo["lat"], geo["lon"]
+    return len(pending)
+
+
+# ==========================
+# 💾 Checkpoint
+# ==========================
+def load_checkpoint(path, source):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            cp = json.load(f)
+        if cp.get("source") == source:
+            return cp
+    return {"source": source, "rows_done": 0, "completed": False}
+
+
+def save_checkpoint(path, cp):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f)
+    os.replace(tmp, path)
+
+
+# ==========================
+# 🚚 Importación
+# ==========================
+def run_import(path, fmt=None, workers=8, batch=500, checkpoint=None, default_status="open"):
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    source = os.path.basename(path)
+    checkpoint = checkpoint or path + ".checkpoint.json"
+    cp = load_checkpoint(checkpoint, source)
+
+    if cp.get("completed"):
+        print(f"✅ {source} ya fue importado por completo (borra {checkpoint} para repetir).")
+        return cp
+
+    rows = read_rows(path, fmt)
+    skipped = cp["rows_done"]
+    if skipped:
+        print(f"↩️ Reanudando desde la fila {skipped}...")
+        rows = islice(rows, skipped, None)
+
+    writer = repository.bulk_writer()
+    started = time.perf_counter()
+    done_this_run = 0
+    row_number = skipped
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(islice(rows, batch))
+            if not chunk:
+                break
+
+            incidents = []
+            for row in chunk:
+                incidents.append(row_to_incident(row, source, row_number, default_status))
+                row_number += 1
+            geocoded = geocode_missing(incidents, pool)
+            for inc in incidents:
+                if not inc["district"]:
+                    inc["district"] = assign_district(inc["lat"], inc["lon"])
+
+            for inc in incidents:
+                writer.set(repository.incident_doc_ref(inc["id"]), inc)
+            writer.flush()
+
+            cp["rows_done"] = row_number
+            save_checkpoint(checkpoint, cp)
+
+            done_this_run += len(incidents)
+            elapsed = time.perf_counter() - started
+            print(f"📦 {row_number} filas | +{len(incidents)} (geocodificadas {geocoded}) "
+                  f"| {done_this_run / elapsed:.1f} filas/s")
+
+    writer.close()
+    cp["completed"] = True
+    save_checkpoint(checkpoint, cp)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Importación terminada: {done_this_run} filas en {elapsed:.1f}s "
+          f"({done_this_run / elapsed if elapsed else 0:.1f} filas/s).")
+    return cp
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa reportes históricos a VeciBot.")
+    parser.add_argument("path", help="Archivo CSV o JSONL")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Formato (por defecto según la extensión)")
+    parser.add_argument("--workers", type=int, default=8, help="Hilos de geocodificación")
+    parser.add_argument("--batch", type=int, default=500, help="Filas por lote / checkpoint")
+    parser.add_argument("--checkpoint", help="Ruta del checkpoint (por defecto <archivo>.checkpoint.json)")
+    parser.add_argument("--default-status", default="open", help="Estado si la fila no trae uno")
+    args = parser.parse_args()
+
+    run_import(args.path, args.format, args.workers, args.batch, args.checkpoint, args.default_status)
@@ -0,0 +1,587 @@
+# load_test.py
+"""
+Prueba de carga y soak de VeciBot de extremo a extremo, sin servicios externos.
+
+Sustituye Firestore, Mapbox y Telegram por dobles locales (con latencia configurable)
+y ejecuta la aplicación real:
+- Vecinos virtuales recorren la conversación de BotView con Updates sintéticos:
+  /start → reporte → ubicación → descripción → categoría → (calificación).
+- Paneles admin: clientes Socket.IO de prueba unidos a la sala global.
+- Sondeo HTTP de /incidents y las APIs de estadísticas, y un operador que resuelve incidentes.
+
+Reporta throughput, latencia reporte→panel, tasa de error y crecimiento de memoria.
+
+Uso:
+    python load_test.py --users 2000 --dashboards 50 --duration 60
+    python load_test.py --users 500 --duration 3600 --interval 60     # soak
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+LIMA = (-12.0464, -77.0428)
+CATEGORIES = ["cat_robo", "cat_acoso", "cat_vandalismo", "cat_emergencia", "cat_otro"]
+
+
+# ==========================
+# 🧪 Doble de Firestore (en memoria)
+# ==========================
+class _ServerTimestamp:
+    """Centinela (no serializable, como el real): se reemplaza por la hora actual al escribir."""
+
+    def __repr__(self):
+        return "Sentinel: Value used to set a document field to the server timestamp."
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class GoogleAPIError(Exception):
+    pass
+
+
+class NotFound(GoogleAPIError):
+    """Como google.api_core.exceptions.NotFound: update() sobre un documento inexistente."""
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+
+def _apply(target, data, merge):
+    for key, value in data.items():
+        if isinstance(value, Increment):
+            target[key] = (target.get(key) or 0) + value.value
+        elif isinstance(value, ArrayUnion):
+            current = list(target.get(key) or [])
+            current.extend(v for v in value.values if v not in current)
+            target[key] = current
+        elif isinstance(value, _ServerTimestamp):
+            target[key] = datetime.now(timezone.utc)
+        elif isinstance(value, dict) and merge:
+            node = target.get(key)
+            if not isinstance(node, dict):
+                node = target[key] = {}
+            _apply(node, value, merge)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _apply(target[key], value, False)
+        else:
+            target[key] = value
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data, version):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self.update_time = version
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocument:
+    def __init__(self, db, col_path, doc_id):
+        self._db, self._col, self.id = db, col_path, doc_id
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self._col}/{self.id}/{name}")
+
+    def set(self, data, merge=False):
+        self._db._write(self._col, self.id, data, merge)
+
+    def update(self, data):
+        self._db._write(self._col, self.id, data, True, must_exist=True)
+
+    def get(self, timeout=None):
+        data, version = self._db._read_doc(self._col, self.id)
+        return FakeSnapshot(self, data, version)
+
+
+class FakeCollection:
+    def __init__(self, db, path, filters=(), order=None, limit=None, after=None):
+        self._db, self._path = db, path
+        self._filters, self._order, self._limit, self._after = list(filters), order, limit, after
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._db, self._path, doc_id or self._db._new_id())
+
+    def where(self, field, op, value):
+        return FakeCollection(self._db, self._path, self._filters + [(field, op, value)], self._order, self._limit, self._after)
+
+    def order_by(self, field, direction=Query.ASCENDING):
+        return FakeCollection(self._db, self._path, self._filters, (field, direction), self._limit, self._after)
+
+    def limit(self, n):
+        return FakeCollection(self._db, self._path, self._filters, self._order, n, self._after)
+
+    def start_after(self, snapshot):
+        return FakeCollection(self._db, self._path, self._filters, self._order, self._limit, snapshot)
+
+    def list_documents(self, timeout=None):
+        return [FakeDocument(self._db, self._path, doc_id) for doc_id in self._db._ids(self._path)]
+
+    def stream(self, timeout=None):
+        ops = {
+            "==": lambda a, b: a == b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+            "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+        }
+        rows = []
+        for doc_id, data, version in self._db._scan(self._path):
+            try:
+                if all(data.get(f) is not None and ops[op](data[f], v) for f, op, v in self._filters):
+                    rows.append((doc_id, data, version))
+            except TypeError:
+                continue
+        if self._order:
+            field, direction = self._order
+            rows = [r for r in rows if r[1].get(field) is not None and not isinstance(r[1].get(field), str)]
+            # Como Firestore: desempate implícito por ID del documento (necesario para los cursores)
+            rows.sort(key=lambda r: (r[1][field], r[0]), reverse=direction == Query.DESCENDING)
+            if self._after is not None:
+                ids = [r[0] for r in rows]
+                rows = rows[ids.index(self._after.id) + 1:] if self._after.id in ids else rows
+        if self._limit:
+            rows = rows[:self._limit]
+        for doc_id, data, version in rows:
+            yield FakeSnapshot(FakeDocument(self._db, self._path, doc_id), data, version)
+
+
+class FakeBatch:
+    """WriteBatch / BulkWriter: aplica las operaciones al hacer commit/flush."""
+
+    def __init__(self, db):
+        self._db, self._ops = db, []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def delete(self, ref):
+        self._ops.append(lambda: self._db._delete(ref._col, ref.id))
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        for op in ops:
+            op()
+
+    flush = close = commit
+
+
+class FakeFirestore:
+    """Subconjunto de google.cloud.firestore.Client que usa repository_firebase."""
+
+    def __init__(self, latency_s=0.0):
+        self.latency_s = latency_s
+        self.ops = Counter()
+        self._cols = defaultdict(dict)
+        self._version = 0
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def bulk_writer(self):
+        return FakeBatch(self)
+
+    def _wait(self, kind):
+        self.ops[kind] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return f"fake{self._next_id:08d}"
+
+    def _write(self, col, doc_id, data, merge, must_exist=False):
+        self._wait("write")
+        with self._lock:
+            docs = self._cols[col]
+            if must_exist and doc_id not in docs:
+                raise NotFound(f"{col}/{doc_id} no existe")
+            current = dict(docs[doc_id][0]) if merge and doc_id in docs else {}
+            _apply(current, data, merge)
+            self._version += 1
+            docs[doc_id] = (current, self._version)
+
+    def _delete(self, col, doc_id):
+        self._wait("write")
+        with self._lock:
+            self._cols[col].pop(doc_id, None)
+
+    def _read_doc(self, col, doc_id):
+        self._wait("read")
+        with self._lock:
+            return self._cols[col].get(doc_id, (None, None))
+
+    def _ids(self, col):
+        with self._lock:
+            return list(self._cols[col])
+
+    def _scan(self, col):
+        self._wait("query")
+        with self._lock:
+            return [(k, d, v) for k, (d, v) in self._cols[col].items()]
+
+
+# ==========================
+# 🔌 Instalación de los dobles
+# ==========================
+class StubBot:
+    """Bot de Telegram simulado: solo cuenta los envíos."""
+    sent = Counter()
+    latency_s = 0.0
+
+    def __init__(self, token=None, **kwargs):
+        pass
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if StubBot.latency_s:
+            await asyncio.sleep(StubBot.latency_s)
+        StubBot.sent["messages"] += 1
+
+
+def install_stand_ins(db, mapbox_latency_s, telegram_latency_s):
+    """Reemplaza Firestore, Mapbox y Telegram antes de importar la aplicación."""
+    for var, value in {
+        "MAPBOX_TOKEN": "loadtest", "TELEGRAM_TOKEN": "0:loadtest", "FIREBASE_KEY": "{}",
+        "RATE_LIMIT_USER": "100000/1", "RATE_LIMIT_IP": "100000/1",
+        "RATE_LIMIT_REPORT_GLOBAL": "100000/1", "RATE_LIMIT_GEOCODE_GLOBAL": "100000/1",
+        "SLOW_REQUEST_MS": "100000",
+    }.items():
+        os.environ.setdefault(var, value)
+
+    fake_firestore = types.ModuleType("google.cloud.firestore")
+    fake_firestore.SERVER_TIMESTAMP = SERVER_TIMESTAMP
+    fake_firestore.Increment = Increment
+    fake_firestore.ArrayUnion = ArrayUnion
+    fake_firestore.Query = Query
+    google = sys.modules.setdefault("google", types.ModuleType("google"))
+    cloud = sys.modules.setdefault("google.cloud", types.ModuleType("google.cloud"))
+    google.cloud = cloud
+    cloud.firestore = fake_firestore
+    sys.modules["google.cloud.firestore"] = fake_firestore
+    api_core = sys.modules.setdefault("google.api_core", types.ModuleType("google.api_core"))
+    exceptions = types.ModuleType("google.api_core.exceptions")
+    exceptions.GoogleAPIError, exceptions.NotFound = GoogleAPIError, NotFound
+    google.api_core, api_core.exceptions = api_core, exceptions
+    sys.modules["google.api_core.exceptions"] = exceptions
+
+    connection = types.ModuleType("data.firebase_connection")
+    connection.db = db
+    sys.modules["data.firebase_connection"] = connection
+
+    from core import geolocalizador, incident_service, notifier
+
+    def fake_fetch_json(url, params, timeout):
+        if mapbox_latency_s:
+            time.sleep(mapbox_latency_s)
+        query = url.rsplit("/", 1)[-1][:-len(".json")]
+        if "," in query:
+            lon, lat = (float(x) for x in query.split(","))
+        else:
+            lat, lon = LIMA
+        return {"features": [{"center": [lon, lat], "place_name": f"Calle Simulada {abs(hash(query)) % 999}, Lima"}]}
+
+    geolocalizador._fetch_json = fake_fetch_json
+    StubBot.latency_s = telegram_latency_s
+    incident_service.Bot = StubBot
+    notifier._sender = notifier.TelegramSender(bot=StubBot(), rate_per_sec=None)
+
+
+# ==========================
+# 📊 Métricas
+# ==========================
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ok = Counter()
+        self.errors = Counter()
+        self.error_samples = []
+        self.latencies = defaultdict(list)
+
+    def success(self, kind, latency_s=None):
+        with self.lock:
+            self.ok[kind] += 1
+            if latency_s is not None:
+                self.latencies[kind].append(latency_s)
+
+    def error(self, kind, exc):
+        with self.lock:
+            self.errors[kind] += 1
+            if len(self.error_samples) < 20:
+                self.error_samples.append(f"{kind}: {exc!r}")
+
+    def take_latencies(self):
+        with self.lock:
+            lat, self.latencies = self.latencies, defaultdict(list)
+        return lat
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ==========================
+# 👥 Vecinos virtuales (BotView)
+# ==========================
+def _replies():
+    box = []
+
+    async def reply(text=None, **kwargs):
+        box.append(text or kwargs.get("caption") or "")
+    return box, reply
+
+
+def _message_update(user, text=None, location=None):
+    box, reply = _replies()
+    message = SimpleNamespace(
+        from_user=user, text=text, location=location, contact=None, photo=None, voice=None,
+        reply_text=reply, reply_photo=reply,
+    )
+    return SimpleNamespace(message=message, callback_query=None, effective_user=user), box
+
+
+def _callback_update(user, data):
+    box, reply = _replies()
+
+    async def answer(*args, **kwargs):
+        return None
+
+    query = SimpleNamespace(data=data, from_user=user, answer=answer, message=SimpleNamespace(reply_text=reply))
+    return SimpleNamespace(message=None, callback_query=query, effective_user=user), box
+
+
+async def virtual_user(view, uid, metrics, pending, stop_at, think_s, rate_prob, rnd):
+    user = SimpleNamespace(id=1_000_000 + uid, username=f"vecino{uid}", first_name="Vecino")
+    ctx = SimpleNamespace(user_data={})
+    seq = 0
+    await asyncio.sleep(rnd.uniform(0, think_s))
+    while time.monotonic() < stop_at:
+        seq += 1
+        text = f"Reporte de carga vu{uid}-{seq}"
+        lat = LIMA[0] + rnd.uniform(-0.08, 0.08)
+        lon = LIMA[1] + rnd.uniform(-0.08, 0.08)
+        t0 = time.perf_counter()
+        try:
+            await view.start(_message_update(user, "/start")[0], ctx)
+            await view.button_handler(_callback_update(user, "reporte")[0], ctx)
+            await view.recibir_ubicacion(_message_update(user, location=SimpleNamespace(latitude=lat, longitude=lon))[0], ctx)
+            await view.recibir_mensaje(_message_update(user, text)[0], ctx)
+            pending[text] = time.perf_counter()
+            update, box = _callback_update(user, rnd.choice(CATEGORIES))
+            await view.categoria_handler(update, ctx)
+            match = re.search(r"🆔 (?:ID: )?([^\s)]+)", box[-1] if box else "")
+            if not match and box and box[-1].startswith("⏳"):
+                # Rechazo por control de admisión: carga descartada a propósito, no un fallo
+                pending.pop(text, None)
+                ctx.user_data.clear()
+                metrics.success("shed")
+                await asyncio.sleep(think_s * rnd.uniform(0.5, 1.5))
+                continue
+            if not match:
+                raise RuntimeError(f"Respuesta inesperada: {box[-1] if box else None!r}")
+            metrics.success("report", time.perf_counter() - t0)
+
+            if rnd.random() < rate_prob:
+                await view.button_handler(_callback_update(user, f"rate_{rnd.randint(1, 5)}_{match.group(1)}")[0], ctx)
+                await view.recibir_mensaje(_message_update(user, "Atención rápida")[0], ctx)
+                metrics.success("rating")
+        except Exception as e:
+            pending.pop(text, None)
+            ctx.user_data.clear()
+            metrics.error("report", e)
+        await asyncio.sleep(think_s * rnd.uniform(0.5, 1.5))
+
+
+async def run_users(view, users, metrics, pending, stop_at, think_s, rate_prob):
+    rnd = random.Random(36)
+    await asyncio.gather(*(
+        virtual_user(view, uid, metrics, pending, stop_at, think_s, rate_prob, random.Random(rnd.random()))
+        for uid in range(users)
+    ))
+
+
+# ==========================
+# 🖥️ Paneles y sondeo HTTP
+# ==========================
+def dashboards_loop(clients, metrics, pending, stop):
+    """Lee los eventos de los clientes Socket.IO y mide la latencia reporte→panel."""
+    while not stop.is_set():
+        for i, client in enumerate(clients):
+            for event in client.get_received():
+                if i:  # el primer panel mide la latencia; el resto solo consume
+                    continue
+                payload = (event.get("args") or [{}])[0] or {}
+                texts = [payload.get("message")]
+                texts += [c.get("message") for c in payload.get("corroborations") or []]
+                for text in texts:
+                    sent_at = pending.pop(text, None)
+                    if sent_at is not None:
+                        metrics.success("report_to_dashboard", time.perf_counter() - sent_at)
+        time.sleep(0.01)
+
+
+def http_poller(app, token, metrics, stop, interval_s, resolve_prob, seed):
+    rnd = random.Random(seed)
+    client = app.test_client()
+    paths = ["/incidents", f"/api/incidents/stats?token={token}", f"/api/incidents/list?token={token}"]
+    while not stop.is_set():
+        for path in paths:
+            t0 = time.perf_counter()
+            try:
+                resp = client.get(path)
+                if resp.status_code != 200:
+                    raise RuntimeError(f"{path} → {resp.status_code}")
+                metrics.success("http", time.perf_counter() - t0)
+                if path == "/incidents" and rnd.random() < resolve_prob:
+                    open_ids = [i["id"] for i in resp.get_json() if i.get("status") == "open"]
+                    if open_ids:
+                        r = client.post(f"/admin/resolve?token={token}", json={"id": rnd.choice(open_ids)})
+                        if r.status_code != 200:
+                            raise RuntimeError(f"/admin/resolve → {r.status_code}")
+                        metrics.success("resolve")
+            except Exception as e:
+                metrics.error("http", e)
+        stop.wait(interval_s)
+
+
+# ==========================
+# ▶️ Ejecución
+# ==========================
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga/soak de VeciBot con dobles locales.")
+    parser.add_argument("--users", type=int, default=1000, help="Vecinos virtuales simultáneos")
+    parser.add_argument("--dashboards", type=int, default=20, help="Clientes Socket.IO (paneles admin)")
+    parser.add_argument("--pollers", type=int, default=4, help="Hilos que sondean /incidents y stats")
+    parser.add_argument("--duration", type=float, default=60, help="Duración en segundos")
+    parser.add_argument("--interval", type=float, default=10, help="Segundos entre reportes parciales")
+    parser.add_argument("--think", type=float, default=5.0, help="Pausa media entre reportes de un vecino (s)")
+    parser.add_argument("--rate-prob", type=float, default=0.3, help="Probabilidad de calificar tras reportar")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Pausa entre sondeos HTTP (s)")
+    parser.add_argument("--resolve-prob", type=float, default=0.2, help="Probabilidad de resolver por sondeo")
+    parser.add_argument("--firestore-ms", type=float, default=2.0, help="Latencia simulada de Firestore")
+    parser.add_argument("--mapbox-ms", type=float, default=20.0, help="Latencia simulada de Mapbox")
+    parser.add_argument("--telegram-ms", type=float, default=10.0, help="Latencia simulada de Telegram")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    db = FakeFirestore(args.firestore_ms / 1000)
+    install_stand_ins(db, args.mapbox_ms / 1000, args.telegram_ms / 1000)
+
+    import app as vecibot
+    from presentation.views.bot_view import BotView
+    from presentation.views.web_view import ADMIN_TOKEN
+
+    metrics = Metrics()
+    pending = {}
+    stop = threading.Event()
+
+    clients = []
+    for _ in range(args.dashboards):
+        client = vecibot.socketio.test_client(vecibot.app)
+        client.emit("join", {"token": ADMIN_TOKEN})
+        clients.append(client)
+
+    threads = [threading.Thread(target=dashboards_loop, args=(clients, metrics, pending, stop), daemon=True)]
+    threads += [
+        threading.Thread(target=http_poller, daemon=True, args=(
+            vecibot.app, ADMIN_TOKEN, metrics, stop, args.poll_interval, args.resolve_prob, i))
+        for i in range(args.pollers)
+    ]
+    for t in threads:
+        t.start()
+
+    started = time.monotonic()
+    stop_at = started + args.duration
+    rss0 = _rss_mb()
+    traced0 = tracemalloc.get_traced_memory()[0] / 1e6
+    print(f"🚀 {args.users} vecinos, {args.dashboards} paneles, {args.pollers} sondeos, {args.duration:.0f}s "
+          f"| RSS inicial {rss0:.1f} MB")
+
+    def reporter():
+        last_ok = Counter()
+        while not stop.wait(args.interval):
+            lat = metrics.take_latencies()
+            ok = Counter(metrics.ok)
+            elapsed = time.monotonic() - started
+            reports = ok["report"] - last_ok["report"]
+            print(
+                f"⏱️ {elapsed:6.0f}s | reportes {ok['report']:7d} ({reports / args.interval:6.1f}/s) "
+                f"| reporte→panel p50 {_pct(lat['report_to_dashboard'], .5):6.1f} ms "
+                f"p95 {_pct(lat['report_to_dashboard'], .95):6.1f} ms "
+                f"| http p95 {_pct(lat['http'], .95):6.1f} ms "
+                f"| rechazados {ok['shed']:5d} | errores {sum(metrics.errors.values()):5d} "
+                f"| RSS {_rss_mb():7.1f} MB | py {tracemalloc.get_traced_memory()[0] / 1e6:7.1f} MB"
+            )
+            last_ok = ok
+
+    threading.Thread(target=reporter, daemon=True).start()
+    view = BotView()
+    try:
+        asyncio.run(run_users(view, args.users, metrics, pending, stop_at, args.think, args.rate_prob))
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
+
+    elapsed = time.monotonic() - started
+    total_ok = sum(metrics.ok.values())
+    total_err = sum(metrics.errors.values())
+    print("\n===== Resumen =====")
+    print(f"Duración: {elapsed:.1f}s | reportes: {metrics.ok['report']} ({metrics.ok['report'] / elapsed:.1f}/s) "
+          f"| calificaciones: {metrics.ok['rating']} | resueltos: {metrics.ok['resolve']} "
+          f"| rechazados por saturación: {metrics.ok['shed']}")
+    print(f"Operaciones OK: {total_ok} | errores: {total_err} ({total_err / max(total_ok + total_err, 1):.2%}) "
+          f"{dict(metrics.errors)}")
+    print(f"Firestore (doble): {dict(db.ops)} | mensajes Telegram (stub): {StubBot.sent['messages']}")
+    print(f"Memoria: RSS {rss0:.1f} → {_rss_mb():.1f} MB | Python {traced0:.1f} → "
+          f"{tracemalloc.get_traced_memory()[0] / 1e6:.1f} MB | reportes sin llegar al panel: {len(pending)}")
+    for sample in metrics.error_samples[:5]:
+        print("  ⚠️", sample)
+
+
+if __name__ == "__main__":
+    main()
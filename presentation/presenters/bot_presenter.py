@@ -7,6 +7,9 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
+from telegram.request import HTTPXRequest
+from core.profiling import span
+from data.bot_persistence import SQLitePersistence
 from presentation.views.bot_view import BotView
 
 # Cargar token desde .env
@@ -16,6 +19,14 @@ BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("❌ No se encontró TELEGRAM_TOKEN en el archivo .env")
 
+class TracedHTTPXRequest(HTTPXRequest):
+    """Cliente HTTP del bot que suma el tiempo de cada llamada a la API de Telegram a la traza activa."""
+
+    async def do_request(self, *args, **kwargs):
+        with span("telegram"):
+            return await super().do_request(*args, **kwargs)
+
+
 async def create_bot_app():
     """
     Crea y devuelve la aplicación del bot de Telegram.
@@ -27,6 +38,8 @@ async def create_bot_app():
     app = (
         ApplicationBuilder()
         .token(BOT_TOKEN)
+        .request(TracedHTTPXRequest())
+        .persistence(SQLitePersistence())
         .build()
     )
 
@@ -35,15 +48,21 @@ async def create_bot_app():
 
     # === Callbacks de botones ===
     # Menú principal + rating (agregamos 'rate_' al patrón)
-    app.add_handler(CallbackQueryHandler(view.button_handler, pattern="^(reporte|mapa|registrar|rate_.*)$"))
+    app.add_handler(CallbackQueryHandler(view.button_handler, pattern="^(reporte|mapa|registrar|alertas|rate_.*)$"))
 
     # Botones de categorías
     app.add_handler(CallbackQueryHandler(view.categoria_handler, pattern="^cat_"))
 
+    # Radio de alertas cercanas
+    app.add_handler(CallbackQueryHandler(view.radio_handler, pattern="^radio_"))
+
     # === Mensajes y contenido ===
     # Ubicación (reportes)
     app.add_handler(MessageHandler(filters.LOCATION, view.recibir_ubicacion))
 
+    # Fotos y notas de voz (evidencias del reporte)
+    app.add_handler(MessageHandler(filters.PHOTO | filters.VOICE, view.recibir_media))
+
     # Contacto (registro de usuario)
     app.add_handler(MessageHandler(filters.CONTACT, view.recibir_contacto))
 
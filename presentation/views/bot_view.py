@@ -1,3 +1,4 @@
+import asyncio
 from telegram import (
     InlineKeyboardButton, InlineKeyboardMarkup,
     KeyboardButton, ReplyKeyboardMarkup, Update
@@ -5,20 +6,44 @@ from telegram import (
 from telegram.ext import ContextTypes
 from core.geolocalizador import reverse_latlon
 from core.incident_service import register_incident, save_feedback_service
+from core.alert_service import subscribe_alerts, RADIUS_OPTIONS_M
+from core.media_service import ingest_telegram_file, MAX_MEDIA_BYTES
+from core.profiling import traced_handler
+from core.rate_limiter import limiter, report_admission, RateLimited, Overloaded
 from data.repository_firebase import register_user, get_user
 
 
+async def _admit_report(user_id, reply):
+    """
+    Aplica el rate limit por usuario + global de reportes. Si se excede,
+    responde al usuario y retorna False.
+    """
+    try:
+        limiter.check(user=user_id, **{"global:report": ""})
+        return True
+    except RateLimited as e:
+        await reply(f"⏳ Estás enviando demasiadas solicitudes. Intenta de nuevo en {int(e.retry_after) + 1} s.")
+        return False
+
+
 class BotView:
 
     # === /start ===
+    @traced_handler
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.message.from_user
-        db_user = get_user(user.id)
+        try:
+            db_user = get_user(user.id)
+        except Exception as e:
+            # Firestore no disponible (breaker abierto o timeout): saludo genérico
+            print("⚠️ No se pudo cargar el usuario:", e)
+            db_user = None
 
         keyboard = [
             [InlineKeyboardButton("🆘 Reportar incidente", callback_data="reporte")],
             [InlineKeyboardButton("🗺️ Ver mapa público", callback_data="mapa")],
-            [InlineKeyboardButton("📝 Registrar mis datos", callback_data="registrar")]
+            [InlineKeyboardButton("📝 Registrar mis datos", callback_data="registrar")],
+            [InlineKeyboardButton("🔔 Alertas cercanas", callback_data="alertas")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -43,6 +68,7 @@ class BotView:
         )
 
     # === Botones principales ===
+    @traced_handler
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
@@ -64,6 +90,16 @@ class BotView:
             await query.message.reply_text("🧍‍♂️ Por favor, escribe tu *nombre completo:*", parse_mode="Markdown")
             context.user_data["modo"] = "registrando_nombre"
 
+        # Suscripción a alertas cercanas
+        elif data == "alertas":
+            kb = [[KeyboardButton("🏠 Enviar ubicación de mi casa", request_location=True)]]
+            await query.message.reply_text(
+                "🔔 Te avisaremos de robos y emergencias cerca de tu casa.\n"
+                "📍 Comparte la ubicación de tu domicilio:",
+                reply_markup=ReplyKeyboardMarkup(kb, one_time_keyboard=True, resize_keyboard=True)
+            )
+            context.user_data["modo"] = "alertas_ubicacion"
+
         # Rating con ID de incidente
         elif data.startswith("rate_"):
             try:
@@ -83,6 +119,7 @@ class BotView:
             )
 
     # === Mensajes ===
+    @traced_handler
     async def recibir_mensaje(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         modo = context.user_data.get("modo")
         text = (update.message.text or "").strip()
@@ -146,6 +183,7 @@ class BotView:
         await update.message.reply_text("Usa /start para iniciar o registrar tus datos.")
 
     # === Contacto ===
+    @traced_handler
     async def recibir_contacto(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         contact = update.message.contact
         if not contact:
@@ -164,9 +202,29 @@ class BotView:
         context.user_data.clear()
 
     # === Ubicación ===
+    @traced_handler
     async def recibir_ubicacion(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         loc = update.message.location
-        info = reverse_latlon(loc.latitude, loc.longitude)
+        if context.user_data.get("modo") == "alertas_ubicacion":
+            context.user_data.update({
+                "alert_lat": loc.latitude,
+                "alert_lon": loc.longitude,
+                "modo": "alertas_radio"
+            })
+            keyboard = [[InlineKeyboardButton(f"{r // 1000} km" if r >= 1000 else f"{r} m", callback_data=f"radio_{r}")
+                         for r in RADIUS_OPTIONS_M]]
+            keyboard.append([InlineKeyboardButton("🔕 Desactivar alertas", callback_data="radio_0")])
+            await update.message.reply_text(
+                "📏 ¿En qué radio quieres recibir alertas?",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return
+
+        # Solo el camino de reporte consume cuota (activar alertas no cuenta)
+        if not await _admit_report(update.message.from_user.id, update.message.reply_text):
+            return
+
+        info = await asyncio.to_thread(reverse_latlon, loc.latitude, loc.longitude)
         address = info.get("address", "Ubicación desconocida")
 
         context.user_data.update({
@@ -176,11 +234,45 @@ class BotView:
             "modo": "esperando_descripcion"
         })
 
+        if info.get("degraded"):
+            address_note = "\n(⚠️ Servicio de direcciones no disponible, se guardarán las coordenadas)"
+        else:
+            address_note = ""
+
         await update.message.reply_text(
-            f"✅ Ubicación detectada:\n📍 {address}\n\nAhora describe el incidente."
+            f"✅ Ubicación detectada:\n📍 {address}{address_note}\n\nAhora describe el incidente."
         )
 
+    # === Fotos y notas de voz ===
+    @traced_handler
+    async def recibir_media(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if context.user_data.get("modo") not in ("esperando_descripcion", "esperando_categoria"):
+            await update.message.reply_text("📎 Para adjuntar fotos o audios, primero inicia un reporte con /start.")
+            return
+
+        if update.message.photo:
+            attachment, kind = update.message.photo[-1], "photo"  # mayor resolución
+        else:
+            attachment, kind = update.message.voice, "voice"
+
+        if attachment.file_size and attachment.file_size > MAX_MEDIA_BYTES:
+            await update.message.reply_text("⚠️ El archivo supera los 20 MB y no se puede adjuntar.")
+            return
+
+        try:
+            tg_file = await attachment.get_file()
+            ref = await ingest_telegram_file(tg_file, kind)
+        except Exception as e:
+            print("⚠️ Error al guardar la evidencia:", e)
+            await update.message.reply_text("⚠️ No se pudo guardar el archivo. Intenta de nuevo.")
+            return
+
+        context.user_data.setdefault("media", []).append(ref)
+        label = "📷 Foto" if kind == "photo" else "🎙️ Nota de voz"
+        await update.message.reply_text(f"{label} adjuntada al reporte ✅")
+
     # === Categoría ===
+    @traced_handler
     async def categoria_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
@@ -200,11 +292,56 @@ class BotView:
         }
         categoria = categoria_map.get(query.data, "Otro")
 
+        if not await _admit_report(user.id, query.message.reply_text):
+            return
+
         lat, lon, address, msg = data.get("lat"), data.get("lon"), data.get("address"), data.get("mensaje_incidente")
-        incident = register_incident(user.id, user.username or user.first_name, msg, address, lat, lon, categoria)
+        try:
+            with report_admission.admit():
+                # Fuera del event loop: los demás updates no esperan a Firestore
+                incident = await asyncio.to_thread(
+                    register_incident, user.id, user.username or user.first_name, msg, address, lat, lon,
+                    categoria, data.get("media")
+                )
+        except Overloaded:
+            await query.message.reply_text("⏳ El sistema está saturado. Toca la categoría de nuevo en unos segundos.")
+            return
+
+        if incident.get("corroborated"):
+            await query.message.reply_text(
+                f"🤝 Ya había un reporte de *{categoria}* muy cerca y reciente (🆔 {incident.get('id')}).\n"
+                "Tu reporte se añadió como confirmación y también recibirás la notificación cuando se resuelva.",
+                parse_mode="Markdown"
+            )
+            context.user_data.clear()
+            return
 
         await query.message.reply_text(
             f"✅ Reporte registrado exitosamente.\n📍 {address}\n🗂️ Categoría: *{categoria}*\n🆔 ID: {incident.get('id')}",
             parse_mode="Markdown"
         )
         context.user_data.clear()
+
+    # === Radio de alertas ===
+    @traced_handler
+    async def radio_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+
+        data = context.user_data
+        if data.get("modo") != "alertas_radio":
+            await query.message.reply_text("Usa /start y elige 🔔 Alertas cercanas para configurarlas.")
+            return
+
+        try:
+            radius = int(query.data.split("_", 1)[1])
+        except ValueError:
+            radius = 0
+
+        subscribe_alerts(query.from_user.id, data.get("alert_lat"), data.get("alert_lon"), radius)
+
+        if radius:
+            await query.message.reply_text(f"✅ Alertas activadas en un radio de {radius} m alrededor de tu casa.")
+        else:
+            await query.message.reply_text("🔕 Alertas cercanas desactivadas.")
+        context.user_data.clear()
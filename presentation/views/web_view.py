@@ -1,13 +1,26 @@
 # presentation/views/web_view.py
 
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, Response, render_template, jsonify, request, send_file, g
 from dotenv import load_dotenv
-import os, json
+import os, mimetypes, threading
+from collections import OrderedDict
 from core.incident_service import mark_resolved, respond_incident
 from core.geolocalizador import geocode_address
-from data.repository_firebase import get_all_incidents
-from core.stats_service import get_statistics
-from datetime import datetime
+from data.repository_firebase import get_incident_models, get_feedback_map
+from core.serialization import dumps, dumps_bytes
+from core.media_store import get_store, valid_key
+from core import profiling
+from core.districts import list_districts, is_known_district
+from core.rate_limiter import limiter, geocode_admission, RateLimited, Overloaded
+from core.circuit_breaker import breaker_states, get_breaker, CircuitOpenError
+from core.hotspot_service import hotspot_snapshot
+from core.search_service import search_incidents
+from core.stats_service import get_statistics, get_period_incidents, empty_statistics
+
+try:
+    from google.api_core.exceptions import GoogleAPIError
+except ImportError:  # sin el SDK de Google instalado (p. ej. con los dobles de load_test)
+    GoogleAPIError = CircuitOpenError
 
 load_dotenv()
 
@@ -15,100 +28,118 @@ web_bp = Blueprint("web", __name__, template_folder="../../ui/templates")
 
 MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN", "")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "vecibot_admin")
+# Server-Timing expone tiempos internos: solo a peticiones con token admin, salvo que se active para todos
+SERVER_TIMING_PUBLIC = os.getenv("SERVER_TIMING_PUBLIC", "0") == "1"
 
-# --- 🔧 Función auxiliar ---
-def clean_value(v):
-    """Convierte valores no serializables (datetime, Timestamp, etc.) a string."""
-    try:
-        if hasattr(v, "isoformat"):
-            return v.isoformat()
-        if isinstance(v, datetime):
-            return v.strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        pass
-    return v
+def normalize_incidents(district=None):
+    """
+    Obtiene los incidentes desde Firebase (modelos Incident) y devuelve su vista
+    para el mapa y panel admin, incluyendo feedback externo.
+    Con `district` solo los de esa jurisdicción.
+    """
+    feedback_map = get_feedback_map()
+    return [
+        inc.map_view(feedback_map.get(inc.id))
+        for inc in get_incident_models(district=district)
+        if inc.has_location
+    ]
 
 
-def normalize_incidents():
+# --- 🔌 Modo degradado: última respuesta válida por clave (LRU acotado) ---
+# Solo los fallos de dependencias activan el modo degradado; un error de programación
+# o de datos de entrada debe verse como tal, no como una caída de Firestore.
+BACKEND_ERRORS = (CircuitOpenError, TimeoutError, GoogleAPIError)
+LAST_GOOD_MAX = int(os.getenv("LAST_GOOD_MAX", "64"))
+_last_good = OrderedDict()
+_last_good_lock = threading.Lock()
+
+
+def serve_with_fallback(key, loader, default):
     """
-    Obtiene los incidentes desde Firebase y los normaliza
-    para el mapa y panel admin, incluyendo feedback externo.
+    Ejecuta loader() y guarda su resultado como último válido para `key`.
+    Si Firestore/Mapbox fallan (BACKEND_ERRORS) o su circuit breaker está abierto,
+    devuelve el último resultado válido (o `default`). Retorna (data, degraded).
     """
     try:
-        from data.repository_firebase import db  # Import aquí para evitar ciclos
-
-        incidents_raw = get_all_incidents()
-        incidents = []
-
-        # === Cargar todos los feedbacks y convertirlos en un diccionario ===
-        feedback_docs = db.collection("feedback").stream()
-        feedback_map = {}
-        for fb in feedback_docs:
-            data = fb.to_dict()
-            if not data:
-                continue
-            incident_id = data.get("incident_id")
-            if incident_id:
-                feedback_map[incident_id] = {
-                    "rating": data.get("rating", 0),
-                    "comment": data.get("comment", "")
-                }
-
-        for inc in incidents_raw:
-            if not inc:
-                continue
-
-            lat = inc.get("lat")
-            lon = inc.get("lon")
-
-            if lat is None or lon is None:
-                continue
-
-            # --- Buscar feedback por ID ---
-            fb = feedback_map.get(inc.get("id"), {})
-            rating = fb.get("rating", 0)
-            comment = fb.get("comment", "")
-
-            incidents.append({
-                "id": inc.get("id"),
-                "user_id": inc.get("user_id"),
-                "username": inc.get("username", "—"),
-                "reporter_name": inc.get("reporter_name") or inc.get("username", "—"),
-                "reporter_dni": inc.get("reporter_dni", "—"),
-                "reporter_phone": inc.get("reporter_phone", "—"),
-                "message": inc.get("message", ""),
-                "category": inc.get("category", "Sin categoría"),
-                "address": inc.get("address", "—"),
-                "status": inc.get("status", "open"),
-                "response": inc.get("response", ""),
-                "lat": float(lat),
-                "lon": float(lon),
-                "created_at": clean_value(inc.get("created_at")),
-                # ⭐ Feedback externo
-                "rating": rating,
-                "comment": comment,
-            })
-
-        return incidents
-
-    except Exception as e:
-        print("❌ Error al normalizar incidentes Firebase:", e)
-        return []
-
+        data = loader()
+    except BACKEND_ERRORS as e:
+        print(f"⚠️ Sirviendo {key[0]} en modo degradado:", e)
+        with _last_good_lock:
+            return _last_good.get(key, default), True
+    with _last_good_lock:
+        _last_good[key] = data
+        _last_good.move_to_end(key)
+        while len(_last_good) > LAST_GOOD_MAX:
+            _last_good.popitem(last=False)
+    return data, False
+
+
+def district_arg():
+    """
+    Parámetro ?district= validado contra los distritos configurados.
+    Retorna (district, error): district None = todos; error es una respuesta 400 lista.
+    """
+    district = request.args.get("district") or None
+    if not is_known_district(district):
+        return None, (jsonify({"error": "Distrito desconocido"}), 400)
+    return district, None
 
 
+def period_args():
+    """
+    Parámetros ?year= y ?month= validados (strings vacíos = sin filtro).
+    Retorna (year, month, error): error es una respuesta 400 lista.
+    """
+    year = request.args.get("year") or None
+    month = request.args.get("month") or None
+    try:
+        if year is not None and not 1 <= int(year) < 9999:
+            raise ValueError
+        if month is not None and not 1 <= int(month) <= 12:
+            raise ValueError
+    except ValueError:
+        return None, None, (jsonify({"error": "Año o mes inválido"}), 400)
+    return year, month, None
+
+
+def json_response(data, degraded=False, status=200):
+    """Respuesta JSON (serializador rápido) + cabeceras con el estado de los breakers y el modo degradado."""
+    resp = Response(dumps_bytes(data), status=status, mimetype="application/json")
+    resp.headers["X-Degraded"] = "1" if degraded else "0"
+    resp.headers["X-Breakers"] = ",".join(f"{name}={b['state']}" for name, b in breaker_states().items())
+    return resp
+
+
+# --- ⏱️ Traza por petición (desglose firestore/mapbox/telegram/serialization) ---
+@web_bp.before_app_request
+def _start_request_trace():
+    g.trace = profiling.start_trace(f"{request.method} {request.path}")
+
+
+@web_bp.after_app_request
+def _finish_request_trace(resp):
+    trace = g.pop("trace", None)
+    if trace:
+        total_ms, breakdown = profiling.finish_trace(*trace)
+        if not SERVER_TIMING_PUBLIC and request.args.get("token") != ADMIN_TOKEN:
+            return resp
+        resp.headers["Server-Timing"] = ", ".join(
+            f"{k};dur={v}" for k, v in breakdown.items()
+        ) + f", total;dur={total_ms:.1f}"
+    return resp
 
 
 # === 🌍 Página principal con mapa ===
 @web_bp.route("/")
 def index():
-    incidents = normalize_incidents()
-    incidents_json = json.dumps(incidents, ensure_ascii=False)
+    incidents, degraded = serve_with_fallback(("incidents",), normalize_incidents, [])
+    incidents_json = dumps(incidents)
     return render_template(
         "index.html",
         INCIDENTS_JSON=incidents_json,
         MAPBOX_TOKEN=MAPBOX_TOKEN,
-        ADMIN_TOKEN=ADMIN_TOKEN
+        ADMIN_TOKEN=ADMIN_TOKEN,
+        DEGRADED=degraded
     )
 
 
@@ -124,8 +155,45 @@ def admin():
 # === 📡 API: lista de incidentes (mapa y panel) ===
 @web_bp.route("/incidents")
 def incidents():
-    incidents = normalize_incidents()
-    return jsonify(incidents)
+    district, error = district_arg()
+    if error:
+        return error
+    incidents, degraded = serve_with_fallback(
+        ("incidents", district), lambda: normalize_incidents(district), []
+    )
+    return json_response(incidents, degraded)
+
+
+# === 🗺️ Distritos configurados ===
+@web_bp.route("/api/districts")
+def api_districts():
+    return jsonify(list_districts())
+
+
+# === 🩺 Estado de dependencias (circuit breakers) ===
+@web_bp.route("/api/health")
+def health():
+    states = breaker_states()
+    degraded = any(b["state"] != "closed" for b in states.values())
+    return json_response({"breakers": states, "degraded": degraded}, degraded)
+
+
+# === 📎 Evidencias (fotos, miniaturas y notas de voz) ===
+@web_bp.route("/media/<key>")
+def media(key):
+    token = request.args.get("token", "")
+    if token != ADMIN_TOKEN:
+        return jsonify({"error": "invalid token"}), 403
+
+    store = get_store()
+    if not valid_key(key) or not store.exists(key):
+        return jsonify({"error": "not found"}), 404
+
+    mimetype = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    resp = send_file(store.open(key), mimetype=mimetype)
+    # Contenido direccionado por hash: nunca cambia
+    resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return resp
 
 
 # === 🗺️ Geocodificación ===
@@ -134,8 +202,23 @@ def geocode():
     q = request.args.get("q", "")
     if not q:
         return jsonify({"error": "missing query"}), 400
-    result = geocode_address(q)
+
+    try:
+        limiter.check(ip=request.remote_addr, **{"global:geocode": ""})
+        with geocode_admission.admit():
+            result = geocode_address(q)
+    except RateLimited as e:
+        resp = jsonify({"error": "too many requests", "retry_after": round(e.retry_after, 1)})
+        resp.headers["Retry-After"] = str(max(1, int(e.retry_after + 0.999)))
+        return resp, 429
+    except Overloaded:
+        resp = jsonify({"error": "server busy"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 429
+
     if not result:
+        if get_breaker("mapbox").is_open:
+            return json_response({"error": "geocoding unavailable", "degraded": True}, True, 503)
         return jsonify({"error": "not found"}), 404
     return jsonify(result)
 
@@ -150,6 +233,8 @@ def resolve():
     data = request.get_json()
     inc_id = data.get("id")
     inc = mark_resolved(inc_id)
+    if inc is None:
+        return jsonify({"error": "not found"}), 404
     return jsonify(inc)
 
 
@@ -168,9 +253,45 @@ def respond():
         return jsonify({"error": "missing parameters"}), 400
 
     inc = respond_incident(inc_id, msg)
+    if inc is None:
+        return jsonify({"error": "not found"}), 404
     return jsonify(inc)
 
 
+# === 🔬 Profiling (solo admin) ===
+@web_bp.route("/admin/profile")
+def admin_profile():
+    token = request.args.get("token", "")
+    if token != ADMIN_TOKEN:
+        return jsonify({"error": "invalid token"}), 403
+
+    seconds = request.args.get("seconds", 10, type=float)
+    try:
+        dump = profiling.sample_stacks(seconds)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(dump, mimetype="text/plain")
+
+
+@web_bp.route("/admin/slow-requests", methods=["GET", "POST"])
+def admin_slow_requests():
+    token = request.args.get("token", "")
+    if token != ADMIN_TOKEN:
+        return jsonify({"error": "invalid token"}), 403
+
+    # Cambiar el umbral modifica estado global: solo por POST {"threshold_ms": 300}
+    if request.method == "POST":
+        try:
+            threshold = float((request.get_json(silent=True) or {})["threshold_ms"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "missing parameters"}), 400
+        profiling.set_slow_threshold(threshold)
+    return jsonify({
+        "threshold_ms": profiling.SLOW_REQUEST_MS,
+        "requests": list(reversed(profiling.slow_requests)),
+    })
+
+
 # === 📊 Página de estadísticas ===
 @web_bp.route("/stats")
 def stats():
@@ -187,12 +308,52 @@ def api_stats():
     if token != ADMIN_TOKEN:
         return jsonify({"error": "No autorizado"}), 403
 
-    year = request.args.get("year")
-    month = request.args.get("month")
+    year, month, error = period_args()
+    if error:
+        return error
     status = request.args.get("status")
+    district, error = district_arg()
+    if error:
+        return error
+
+    stats_data, degraded = serve_with_fallback(
+        ("stats", year, month, status, district),
+        lambda: get_statistics(year, month, status, district),
+        empty_statistics()
+    )
+    return json_response(stats_data, degraded)
+
+
+# === 🔥 API: zonas calientes (instantánea precalculada) ===
+@web_bp.route("/api/hotspots")
+def api_hotspots():
+    token = request.args.get("token")
+    if token != ADMIN_TOKEN:
+        return jsonify({"error": "No autorizado"}), 403
+    district, error = district_arg()
+    if error:
+        return error
+    return Response(hotspot_snapshot(district), mimetype="application/json")
+
+
+# === 🔎 API: búsqueda de texto completo ===
+@web_bp.route("/api/incidents/search")
+def api_incident_search():
+    token = request.args.get("token")
+    if token != ADMIN_TOKEN:
+        return jsonify({"error": "No autorizado"}), 403
+
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "Falta el parámetro q"}), 400
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 20, type=int)
+    district, error = district_arg()
+    if error:
+        return error
+    return json_response(search_incidents(query, page, per_page, district))
+
 
-    stats_data = get_statistics(year, month, status)
-    return jsonify(stats_data)
 # === 📋 API: Lista de incidentes (para stats.html) ===
 @web_bp.route("/api/incidents/list")
 def api_incident_list():
@@ -200,65 +361,47 @@ def api_incident_list():
     if token != ADMIN_TOKEN:
         return jsonify({"error": "No autorizado"}), 403
 
-    from data.repository_firebase import db
-
-    year = request.args.get("year")
-    month = request.args.get("month")
+    year, month, error = period_args()
+    if error:
+        return error
     status = request.args.get("status")
     user_id = request.args.get("user")
+    district, error = district_arg()
+    if error:
+        return error
+
+    filtered, degraded = serve_with_fallback(
+        ("list", year, month, status, user_id, district),
+        lambda: _incident_list(year, month, status, user_id, district),
+        []
+    )
+    return json_response(filtered, degraded)
 
-    incidents = get_all_incidents()
 
-    # === Cargar feedback separado ===
-    feedback_docs = db.collection("feedback").stream()
-    feedback_map = {}
-    for fb in feedback_docs:
-        data = fb.to_dict()
-        if not data:
-            continue
-        incident_id = data.get("incident_id")
-        if incident_id:
-            feedback_map[incident_id] = {
-                "rating": data.get("rating", 0),
-                "comment": data.get("comment", "")
-            }
+def _incident_list(year, month, status, user_id, district=None):
+    incidents = get_period_incidents(year, month, status, district)
+
+    # === Feedback indexado por incidente ===
+    feedback_map = get_feedback_map()
 
     filtered = []
     for inc in incidents:
-        if not inc:
-            continue
-
-        created_at = inc.get("created_at")
-        if hasattr(created_at, "isoformat"):
-            created_at = created_at.isoformat()
+        created_at = str(inc.created_at_iso)
 
         # --- Aplicar filtros ---
-        if year and str(created_at)[:4] != str(year):
+        if year and created_at[:4] != str(year):
             continue
-        if month and f"-{int(month):02d}-" not in str(created_at):
+        if month and f"-{int(month):02d}-" not in created_at:
             continue
-        if status and inc.get("status") != status:
+        if status and inc.status != status:
             continue
-        if user_id and str(inc.get("user_id")) != str(user_id):
+        if user_id and str(inc.user_id) != str(user_id):
             continue
 
         # --- Asociar feedback por incident_id ---
-        fb = feedback_map.get(inc.get("id"), {})
-        rating = fb.get("rating", 0)
-        comment = fb.get("comment", "")
-
-        filtered.append({
-            "id": inc.get("id"),
-            "usuario": inc.get("reporter_name", inc.get("username", "—")),
-            "fecha": created_at,
-            "categoria": inc.get("category", "—"),
-            "descripcion": inc.get("message", ""),
-            "estado": inc.get("status", "open"),
-            "rating": rating,
-            "comentario": comment
-        })
-
-    return jsonify(filtered)
+        filtered.append(inc.list_view(feedback_map.get(inc.id)))
+
+    return filtered
 
 
 
@@ -0,0 +1,127 @@
+# tests/test_bot_persistence.py
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from data import bot_persistence
+from data.bot_persistence import SQLitePersistence
+
+
+@pytest.fixture
+def persistence(tmp_path):
+    return SQLitePersistence(path=str(tmp_path / "state.sqlite3"), ttl_hours=1)
+
+
+def _rows(p):
+    return dict(p._read_conn.execute("SELECT user_id, data FROM conversations").fetchall())
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_only_changed_users_are_written(persistence):
+    async def scenario():
+        await persistence.update_user_data(1, {"step": "address"})
+        await persistence.update_user_data(2, {"step": "photo"})
+        await persistence.flush()
+        first = dict(persistence._dirty)
+        # Mismo estado que el escrito: no queda pendiente
+        await persistence.update_user_data(1, {"step": "address"})
+        await persistence.update_user_data(2, {"step": "done"})
+        return first, dict(persistence._dirty)
+
+    first, pending = _run(scenario())
+    assert first == {}
+    assert set(pending) == {2}
+    assert persistence.write_pending() == 1
+    assert _rows(persistence) == {1: '{"step":"address"}', 2: '{"step":"done"}'}
+
+
+def test_empty_state_deletes_the_row(persistence):
+    async def scenario():
+        await persistence.update_user_data(1, {"step": "address"})
+        await persistence.flush()
+        await persistence.update_user_data(1, {})
+        await persistence.flush()
+
+    _run(scenario())
+    assert _rows(persistence) == {}
+
+
+def test_lazy_load_on_first_update(persistence, tmp_path):
+    _run(persistence.update_user_data(7, {"step": "address"}))
+    persistence.write_pending()
+
+    fresh = SQLitePersistence(path=str(tmp_path / "state.sqlite3"), ttl_hours=1)
+    assert _run(fresh.get_user_data()) == {}
+    user_data = {}
+    _run(fresh.refresh_user_data(7, user_data))
+    assert user_data == {"step": "address"}
+
+
+def test_expired_row_is_ignored_and_deleted(persistence, tmp_path):
+    persistence._write_conn.execute(
+        "INSERT INTO conversations(user_id, data, updated_at) VALUES (?, ?, ?)",
+        (7, '{"step":"address"}', time.time() - 2 * 3600),
+    )
+    user_data = {"stale": True}
+    _run(persistence.refresh_user_data(7, user_data))
+    assert user_data == {}
+    assert persistence._dirty == {7: ""}
+    persistence.write_pending()
+    assert _rows(persistence) == {}
+
+
+def test_abandoned_conversation_in_memory_is_cleared(persistence, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot_persistence.time, "monotonic", lambda: now[0])
+    user_data = {}
+    _run(persistence.refresh_user_data(7, user_data))
+    user_data["step"] = "address"
+
+    now[0] += 1800
+    _run(persistence.refresh_user_data(7, user_data))
+    assert user_data == {"step": "address"}
+
+    now[0] += 2 * 3600
+    _run(persistence.refresh_user_data(7, user_data))
+    assert user_data == {}
+
+
+def test_purge_expired(persistence):
+    conn = persistence._write_conn
+    conn.execute("INSERT INTO conversations VALUES (1, '{}', ?)", (time.time() - 2 * 3600,))
+    conn.execute("INSERT INTO conversations VALUES (2, '{}', ?)", (time.time(),))
+    assert persistence.purge_expired() == 1
+    assert set(_rows(persistence)) == {2}
+
+
+class _BrokenConnection:
+    """Conexión cuyo BEGIN falla (p. ej. base bloqueada); antes llega un update más nuevo."""
+    in_transaction = False
+
+    def __init__(self, persistence):
+        self.persistence = persistence
+
+    def execute(self, sql, *args):
+        if sql == "ROLLBACK":
+            raise AssertionError("ROLLBACK sin transacción abierta")
+        self.persistence._dirty[1] = '{"step":"photo"}'
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_failed_write_keeps_changes_pending(persistence):
+    _run(persistence.update_user_data(1, {"step": "address"}))
+    _run(persistence.update_user_data(2, {"step": "address"}))
+    real = persistence._write_conn
+    persistence._write_conn = _BrokenConnection(persistence)
+    assert persistence.write_pending() == 0
+    # Se reintenta todo, sin pisar el cambio que llegó durante la escritura fallida
+    assert persistence._dirty == {1: '{"step":"photo"}', 2: '{"step":"address"}'}
+
+    persistence._write_conn = real
+    assert persistence.write_pending() == 2
+    assert _rows(persistence) == {1: '{"step":"photo"}', 2: '{"step":"address"}'}
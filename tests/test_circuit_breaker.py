@@ -0,0 +1,101 @@
+# tests/test_circuit_breaker.py
+import threading
+import time
+
+import pytest
+
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _fail():
+    raise ValueError("boom")
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    cb = CircuitBreaker("t", failure_threshold=2, reset_timeout=60, call_timeout=1)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cb.call(_fail)
+    assert cb.state == OPEN and cb.is_open
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        cb.call(calls.append, 1)
+    assert calls == []
+
+
+def test_success_resets_failure_count():
+    cb = CircuitBreaker("t", failure_threshold=2, call_timeout=1)
+    with pytest.raises(ValueError):
+        cb.call(_fail)
+    assert cb.call(lambda: 42) == 42
+    with pytest.raises(ValueError):
+        cb.call(_fail)
+    assert cb.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    cb = CircuitBreaker("t", failure_threshold=1, reset_timeout=0.05, call_timeout=1)
+    with pytest.raises(ValueError):
+        cb.call(_fail)
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        cb.call(_fail)          # la prueba falla: vuelve a abrirse
+    assert cb.state == OPEN
+
+    time.sleep(0.06)
+    assert cb.call(lambda: "ok") == "ok"
+    assert cb.state == CLOSED
+
+
+def test_only_one_probe_in_half_open():
+    cb = CircuitBreaker("t", failure_threshold=1, reset_timeout=0.05, call_timeout=2)
+    with pytest.raises(ValueError):
+        cb.call(_fail)
+    time.sleep(0.06)
+
+    release = threading.Event()
+    probe = threading.Thread(target=cb.call, args=(release.wait, 2))
+    probe.start()
+    time.sleep(0.05)
+    assert cb.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: None)
+    release.set()
+    probe.join()
+    assert cb.state == CLOSED
+
+
+def test_slow_call_times_out_and_counts_as_failure():
+    cb = CircuitBreaker("t", failure_threshold=1, call_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        cb.call(time.sleep, 0.3)
+    assert cb.state == OPEN
+
+
+def test_queued_call_is_not_a_dependency_failure():
+    # Un solo worker ocupado: la segunda llamada nunca empieza y no debe abrir el circuito
+    cb = CircuitBreaker("t", failure_threshold=1, call_timeout=0.1, max_workers=1)
+    release = threading.Event()
+    cb._pool.submit(release.wait, 1)
+
+    with pytest.raises(TimeoutError, match="sin workers libres"):
+        cb.call(lambda: None)
+    assert cb.state == CLOSED and cb.failures == 0
+    release.set()
+
+
+def test_queued_probe_is_released():
+    cb = CircuitBreaker("t", failure_threshold=1, reset_timeout=0.05, call_timeout=0.1, max_workers=1)
+    with pytest.raises(ValueError):
+        cb.call(_fail)
+    time.sleep(0.06)
+    release = threading.Event()
+    cb._pool.submit(release.wait, 1)
+
+    with pytest.raises(TimeoutError):
+        cb.call(lambda: None)      # la prueba se quedó en la cola
+    release.set()
+    # La siguiente llamada puede volver a probar (no queda marcada una prueba en curso)
+    assert cb.call(lambda: "ok") == "ok"
+    assert cb.state == CLOSED
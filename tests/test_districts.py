@@ -0,0 +1,59 @@
+# tests/test_districts.py
+from core.districts import DistrictIndex, _point_in_polygon
+
+
+def _square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+def _feature(district_id, geometry_type, coordinates, name=None):
+    return {
+        "type": "Feature",
+        "properties": {"id": district_id, "name": name or district_id},
+        "geometry": {"type": geometry_type, "coordinates": coordinates},
+    }
+
+
+FEATURES = [
+    # Polígono con un agujero en el centro
+    _feature("centro", "Polygon", [_square(-77.10, -12.10, -77.00, -12.00), _square(-77.06, -12.06, -77.04, -12.04)]),
+    # MultiPolígono: dos islas separadas
+    _feature("islas", "MultiPolygon", [[_square(-77.20, -12.10, -77.15, -12.05)], [_square(-77.30, -12.10, -77.25, -12.05)]]),
+]
+
+
+def test_point_in_polygon_respects_holes():
+    polygon = FEATURES[0]["geometry"]["coordinates"]
+    assert _point_in_polygon(-12.02, -77.02, polygon)
+    assert not _point_in_polygon(-12.05, -77.05, polygon)   # dentro del agujero
+    assert not _point_in_polygon(-11.90, -77.05, polygon)   # fuera
+
+
+def test_locate_polygon_and_multipolygon():
+    idx = DistrictIndex(FEATURES)
+    assert idx.locate(-12.02, -77.02) == "centro"
+    assert idx.locate(-12.07, -77.17) == "islas"
+    assert idx.locate(-12.07, -77.27) == "islas"
+
+
+def test_locate_outside_and_in_hole():
+    idx = DistrictIndex(FEATURES)
+    assert idx.locate(-12.05, -77.05) is None
+    assert idx.locate(-12.07, -77.22) is None   # entre las dos islas
+    assert idx.locate(0.0, 0.0) is None
+
+
+def test_polygon_spanning_many_cells():
+    # Con celdas chicas el polígono se registra en todas las que toca su bounding box
+    idx = DistrictIndex(FEATURES, cell_deg=0.005)
+    assert idx.locate(-12.099, -77.099) == "centro"
+    assert idx.locate(-12.001, -77.001) == "centro"
+
+
+def test_district_names():
+    idx = DistrictIndex([_feature("d1", "Polygon", [_square(0, 0, 1, 1)], name="Miraflores")])
+    assert idx.districts == {"d1": "Miraflores"}
+
+
+def test_no_districts_configured():
+    assert DistrictIndex([]).locate(-12.05, -77.05) is None
@@ -0,0 +1,163 @@
+# tests/test_hotspot_service.py
+import math
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import data
+from core import hotspot_service
+from core.hotspot_service import HotspotDetector
+
+LAT, LON = -12.05, -77.05
+BUCKET_S = 5 * 60
+
+
+def _detector(**kwargs):
+    params = dict(cell_deg=0.005, window_min=60, bucket_min=5, min_count=3, factor=3, baseline_hours=1)
+    params.update(kwargs)
+    return HotspotDetector(**params)
+
+
+def _cell_total(det):
+    return sum(c.total for c in det._cells.values())
+
+
+def _cell(det):
+    (c,) = det._cells.values()
+    return c
+
+
+def test_alert_fires_once_when_threshold_is_reached():
+    det = _detector()
+    t0 = 1000 * BUCKET_S
+    keys = [det.add("Robo", LAT, LON, t0 + k * 60) for k in range(4)]
+    assert keys[:2] == [None, None]
+    assert keys[2] == ("Robo", math.floor(LAT / 0.005), math.floor(LON / 0.005))
+    assert keys[3] is None      # ya estaba caliente
+    assert det.info(keys[2])["count"] == 4
+
+
+def test_categories_and_cells_are_counted_separately():
+    det = _detector()
+    t0 = 1000 * BUCKET_S
+    for k in range(2):
+        det.add("Robo", LAT, LON, t0 + k)
+        det.add("Acoso", LAT, LON, t0 + k)
+        det.add("Robo", LAT + 0.01, LON, t0 + k)
+    assert len(det) == 3
+    assert all(c.total == 2 for c in det._cells.values())
+
+
+def test_advance_expires_buckets_into_the_baseline():
+    det = _detector()
+    t0 = 1000 * BUCKET_S
+    det.add("Robo", LAT, LON, t0)
+    det.add("Robo", LAT, LON, t0 + 1)
+    c = _cell(det)
+
+    # La cubeta con 2 incidentes sale de la ventana tras `buckets` cubetas
+    det._advance(c, 1000 + det.buckets - 1)
+    assert c.total == 2 and c.baseline == 0.0
+    det._advance(c, 1000 + det.buckets)
+    assert c.total == 0
+    assert c.baseline == pytest.approx(det.alpha * 2)
+
+
+def test_empty_buckets_decay_the_baseline():
+    det = _detector()
+    c = hotspot_service._CellCounter(det.buckets, 1000, None)
+    c.baseline = 1.0
+    det._advance(c, 1000 + det.buckets + 10)
+    # `buckets` cubetas vacías expiradas + 10 más por el salto largo
+    assert c.baseline == pytest.approx((1 - det.alpha) ** (det.buckets + 10))
+    assert c.last_bucket == 1000 + det.buckets + 10
+
+
+def test_baseline_raises_the_threshold():
+    det = _detector(min_count=1)
+    c = hotspot_service._CellCounter(det.buckets, 1000, None)
+    c.baseline = 0.5
+    assert det.expected(c) == pytest.approx(0.5 * det.buckets)
+    assert det.threshold(c) == pytest.approx(3 * 0.5 * det.buckets)
+
+
+def test_reports_older_than_the_window_are_ignored():
+    det = _detector()
+    t0 = 1000 * BUCKET_S
+    det.add("Robo", LAT, LON, t0)
+    det.add("Robo", LAT, LON, t0 - det.buckets * BUCKET_S)
+    assert _cell(det).total == 1
+
+
+def test_tick_cools_down_and_prunes_idle_cells():
+    det = _detector()
+    t0 = 1000 * BUCKET_S
+    key = None
+    for k in range(3):
+        key = det.add("Robo", LAT, LON, t0 + k) or key
+    assert det.info(key)["hot"]
+
+    det.tick(t0 + det.buckets * BUCKET_S)
+    assert not det.info(key)["hot"]
+    # Sigue mientras su línea base tenga historia reciente
+    det.tick(t0 + det.idle_buckets * BUCKET_S)
+    assert len(det) == 1
+    det.tick(t0 + (det.idle_buckets + 1) * BUCKET_S)
+    assert len(det) == 0
+
+
+# === Precarga: los reportes en vivo se guardan hasta tener el historial ===
+@pytest.fixture
+def service(monkeypatch):
+    det = _detector(min_count=100, baseline_hours=2)
+    monkeypatch.setattr(hotspot_service, "_detector", det)
+    monkeypatch.setattr(hotspot_service, "_warming", True)
+    monkeypatch.setattr(hotspot_service, "_buffered", [])
+    monkeypatch.setattr(hotspot_service, "HOTSPOT_BASELINE_HOURS", 2)
+    monkeypatch.setattr(hotspot_service, "emit_event", lambda *a: None)
+
+    pages = []
+    repo = types.ModuleType("data.repository_firebase")
+    repo.iter_incident_pages = lambda since, include_archive=True: iter(pages)
+    monkeypatch.setitem(sys.modules, "data.repository_firebase", repo)
+    monkeypatch.setattr(data, "repository_firebase", repo, raising=False)
+    return det, pages
+
+
+def _incident(incident_id, minutes_ago, corroborations=()):
+    now = datetime.now(timezone.utc)
+    return {
+        "id": incident_id, "category": "Robo", "lat": LAT, "lon": LON,
+        "created_at": now - timedelta(minutes=minutes_ago),
+        "corroborations": [{"created_at": now - timedelta(minutes=m)} for m in corroborations],
+    }
+
+
+def test_warm_up_replays_history_and_skips_duplicated_live_reports(service):
+    det, pages = service
+    on_incident = hotspot_service._listener("new_incident")
+    on_corroboration = hotspot_service._listener("new_corroboration")
+
+    a = _incident("a", 30, corroborations=[20])
+    b = _incident("b", 10)
+    pages.append([a, b])
+    # Llegan en vivo mientras se lee el historial: 'b' y la corroboración de 'a' ya están en él
+    on_incident(b)
+    on_corroboration(dict(a, created_at=a["corroborations"][0]["created_at"]))
+    on_incident(_incident("c", 0))
+
+    assert _cell_total(det) == 0       # nada se cuenta antes de terminar la precarga
+    hotspot_service._warm_up()
+    assert _cell_total(det) == 4       # a, corroboración de a, b (historial) + c (en vivo)
+
+    on_incident(_incident("d", 0))     # ya sin precarga: cuenta directo
+    assert _cell_total(det) == 5
+
+
+def test_warm_up_ignores_history_outside_the_baseline(service):
+    det, pages = service
+    pages.append([_incident("old", 3 * 60), _incident("new", 5)])
+    hotspot_service._warm_up()
+    assert _cell_total(det) == 1
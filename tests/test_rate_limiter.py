@@ -0,0 +1,130 @@
+# tests/test_rate_limiter.py
+import sys
+import types
+
+import pytest
+
+from core import rate_limiter
+from core.rate_limiter import MemoryStore, RateLimited, RateLimiter, RedisStore
+
+
+class _Clock:
+    """Reloj manual para time.monotonic / time.time."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", c)
+    monkeypatch.setattr(rate_limiter.time, "time", c)
+    return c
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    store = MemoryStore()
+    rate, burst = 1.0, 3.0
+    assert all(store.consume("u:1", rate, burst)[0] for _ in range(3))
+
+    allowed, retry_after = store.consume("u:1", rate, burst)
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert store.consume("u:1", rate, burst)[0]
+    assert not store.consume("u:1", rate, burst)[0]
+
+
+def test_buckets_are_independent(clock):
+    store = MemoryStore()
+    assert store.consume("u:1", 1.0, 1.0)[0]
+    assert not store.consume("u:1", 1.0, 1.0)[0]
+    assert store.consume("u:2", 1.0, 1.0)[0]
+
+
+def test_sweep_uses_each_bucket_refill_time(clock):
+    store = MemoryStore()
+    store.consume("fast", 10.0, 1.0)     # lleno de nuevo en 0.1 s
+    store.consume("slow", 1.0 / 60, 5.0)  # lleno de nuevo en 60 s
+
+    clock.now += 1.0
+    store._sweep(clock.now)
+    assert "fast" not in store._buckets
+    assert "slow" in store._buckets
+
+    clock.now += 60.0
+    store._sweep(clock.now)
+    assert store._buckets == {}
+
+
+def test_sweep_does_not_reset_a_drained_bucket(clock, monkeypatch):
+    monkeypatch.setattr(MemoryStore, "SWEEP_EVERY", 2)
+    store = MemoryStore()
+    rate, burst = 1.0 / 60, 2.0
+    assert store.consume("u:1", rate, burst)[0]
+    assert store.consume("u:1", rate, burst)[0]   # aquí corre el barrido
+    clock.now += 1.0
+    assert not store.consume("u:1", rate, burst)[0]
+
+
+def test_limiter_checks_individual_scopes_before_global(clock):
+    limiter = RateLimiter({"user": (1.0, 1.0), "global:report": (1.0, 10.0)})
+    limiter.check(user=1, **{"global:report": ""})
+    with pytest.raises(RateLimited) as exc:
+        limiter.check(user=1, **{"global:report": ""})
+    assert exc.value.key == "user:1"
+    # El rechazo por usuario no gastó cuota global
+    assert limiter.store._buckets["global:report:"][0] == pytest.approx(9.0)
+
+
+# === RedisStore: se cae a memoria si Redis falla ===
+class _RedisError(Exception):
+    pass
+
+
+class _FakeRedisClient:
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def register_script(self, source):
+        def script(keys, args):
+            self.calls += 1
+            if self.down:
+                raise _RedisError("connection refused")
+            return [1, "0"]
+        return script
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    client = _FakeRedisClient()
+    fake = types.ModuleType("redis")
+    fake.RedisError = _RedisError
+    fake.Redis = types.SimpleNamespace(from_url=lambda url: client)
+    monkeypatch.setitem(sys.modules, "redis", fake)
+    return RedisStore("redis://localhost"), client
+
+
+def test_redis_store_uses_script_when_available(redis_store):
+    store, client = redis_store
+    assert store.consume("u:1", 1.0, 1.0) == (True, 0.0)
+    assert client.calls == 1
+
+
+def test_redis_store_falls_back_to_memory_and_recovers(redis_store, clock):
+    store, client = redis_store
+    client.down = True
+    # Mientras Redis no responde se sigue limitando (en memoria), no se deja pasar todo
+    assert store.consume("u:1", 1.0, 1.0)[0]
+    assert not store.consume("u:1", 1.0, 1.0)[0]
+    assert store._down
+
+    client.down = False
+    assert store.consume("u:1", 1.0, 1.0) == (True, 0.0)
+    assert not store._down
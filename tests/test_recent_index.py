@@ -0,0 +1,53 @@
+# tests/test_recent_index.py
+from core.spatial_index import RecentIndex
+
+LIMA = (-12.0464, -77.0428)
+M_PER_DEG = 111320.0
+
+
+def _offset(lat, lon, north_m=0.0):
+    return lat + north_m / M_PER_DEG, lon
+
+
+def test_finds_same_category_within_radius_and_window():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    idx.add("a", "Robo", *LIMA, ts=1000)
+    assert idx.find("Robo", *_offset(*LIMA, north_m=100), now=1500) == "a"
+
+
+def test_ignores_other_category_distance_and_age():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    idx.add("a", "Robo", *LIMA, ts=1000)
+    assert idx.find("Acoso", *LIMA, now=1500) is None
+    assert idx.find("Robo", *_offset(*LIMA, north_m=300), now=1500) is None
+    assert idx.find("Robo", *LIMA, now=1000 + 1801) is None
+    # Las entradas vencidas se descartan al consultar
+    assert len(idx) == 0
+
+
+def test_prefers_the_closest_match():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    idx.add("far", "Robo", *_offset(*LIMA, north_m=120), ts=1000)
+    idx.add("near", "Robo", *_offset(*LIMA, north_m=20), ts=1001)
+    assert idx.find("Robo", *LIMA, now=1100) == "near"
+
+
+def test_match_across_cell_border():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    border = idx.cell_deg * 1000   # límite exacto entre dos celdas
+    idx.add("a", "Robo", border - 50 / M_PER_DEG, -77.0, ts=1000)
+    assert idx.find("Robo", border + 50 / M_PER_DEG, -77.0, now=1100) == "a"
+
+
+def test_removed_incident_is_not_matched():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    idx.add("a", "Robo", *LIMA, ts=1000)
+    idx.remove("a")
+    assert idx.find("Robo", *LIMA, now=1100) is None
+    assert len(idx) == 0
+
+
+def test_future_entries_are_not_matched():
+    idx = RecentIndex(radius_m=150, window_s=1800)
+    idx.add("a", "Robo", *LIMA, ts=2000)
+    assert idx.find("Robo", *LIMA, now=1500) is None
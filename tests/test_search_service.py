@@ -0,0 +1,131 @@
+# tests/test_search_service.py
+from datetime import datetime, timezone
+
+import pytest
+
+from core import search_service
+from core.search_service import SearchIndex, query_tokens
+
+
+def _incident(incident_id, message, address="", **extra):
+    return dict({
+        "id": incident_id, "status": "open", "category": "Otro", "message": message, "address": address,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    }, **extra)
+
+
+def _ids(index, query, **kwargs):
+    return [doc["id"] for _, doc in index.search(query, **kwargs)[1]]
+
+
+@pytest.fixture
+def index():
+    idx = SearchIndex()
+    idx.upsert(_incident("1", "Robo de celular", "Plaza San Martín", category="Robo"))
+    idx.upsert(_incident("2", "Asalto a mano armada", "Av. Martínez 123", category="Robo"))
+    idx.upsert(_incident("3", "Acoso en el paradero", "Jr. Huancavelica", category="Acoso", district="centro"))
+    return idx
+
+
+def test_accents_and_case_are_ignored(index):
+    assert _ids(index, "plaza san martin") == ["1"]
+    assert _ids(index, "PLAZA SAN MARTÍN") == ["1"]
+    assert _ids(index, "martinez") == ["2"]
+
+
+def test_prefix_matches(index):
+    assert sorted(_ids(index, "mart")) == ["1", "2"]
+    assert _ids(index, "cel") == ["1"]
+
+
+def test_exact_term_ranks_above_prefix():
+    idx = SearchIndex()
+    idx.upsert(_incident("exacto", "Robo", "Jr. San Martín"))
+    idx.upsert(_incident("prefijo", "Robo", "Av. Martínez"))
+    idx.upsert(_incident("otro", "Robo", "Jr. Lampa"))
+    assert _ids(idx, "martin") == ["exacto", "prefijo"]
+
+
+def test_all_tokens_must_match(index):
+    assert _ids(index, "robo plaza") == ["1"]
+    assert _ids(index, "robo paradero") == []
+    assert _ids(index, "inexistente") == []
+
+
+def test_stopwords_only_query_returns_nothing(index):
+    assert index.search("de la") == (0, [])
+
+
+def test_district_filter(index):
+    assert _ids(index, "acoso", district="centro") == ["3"]
+    assert _ids(index, "robo", district="centro") == []
+
+
+def test_text_update_replaces_old_postings(index):
+    index.upsert(_incident("1", "Robo de bicicleta", "Plaza San Martín"))
+    assert _ids(index, "celular") == []
+    assert _ids(index, "bicicleta") == ["1"]
+    assert len(index) == 3
+
+
+def test_status_only_update_keeps_postings(index):
+    before = dict(index._postings["celular"])
+    # update_incident trae el documento completo; solo cambió el estado
+    index.upsert(_incident("1", "Robo de celular", "Plaza San Martín", category="Robo", status="resolved"))
+    assert index._postings["celular"] == before
+    (_, doc), = index.search("celular")[1]
+    assert doc["status"] == "resolved"
+    assert doc["message"] == "Robo de celular"
+    assert doc["created_at"] == "2025-01-01T00:00:00+00:00"
+
+
+def test_remove_and_compact(index):
+    index.upsert(_incident("2", "Asalto a mano armada en la avenida"))
+    index.remove("3")
+    assert _ids(index, "acoso") == []
+    assert index.compact() == 2
+    assert sorted(_ids(index, "asalto avenida")) == ["2"]
+    assert _ids(index, "plaza") == ["1"]
+    assert len(index._docs) == 2
+
+
+def test_phone_search():
+    idx = SearchIndex()
+    idx.upsert(_incident("1", "Robo", reporter_phone="+51 987 654 321"))
+    assert query_tokens("987 654 321") == ["987654321"]
+    assert _ids(idx, "987 654 321") == ["1"]
+
+
+def test_pagination_newest_first():
+    idx = SearchIndex()
+    for i in range(5):
+        idx.upsert(_incident(str(i), "Robo de celular"))
+    assert _ids(idx, "celular", offset=0, limit=2) == ["4", "3"]
+    total, hits = idx.search("celular", offset=2, limit=2)
+    assert total == 5
+    assert [doc["id"] for _, doc in hits] == ["2", "1"]
+
+
+def test_bitmap_path_matches_set_path():
+    idx = SearchIndex()
+    for i in range(200):
+        idx.upsert(_incident(str(i), "Robo de celular" if i % 2 else "Robo de bicicleta", district="d%d" % (i % 3)))
+    # 'robo' está en todos los documentos: la consulta va por mapas de bits
+    total, _ = idx.search("robo celular", limit=200)
+    assert total == 100
+    total, hits = idx.search("robo", limit=200, district="d1")
+    assert total == sum(1 for i in range(200) if i % 3 == 1)
+    assert all(doc["district"] == "d1" for _, doc in hits)
+
+
+def test_no_results_until_ready(monkeypatch, index):
+    monkeypatch.setattr(search_service, "_index", index)
+    monkeypatch.setattr(search_service, "_ready", False)
+    result = search_service.search_incidents("celular")
+    assert result["ready"] is False
+    assert result["total"] == 0 and result["results"] == []
+
+    monkeypatch.setattr(search_service, "_ready", True)
+    result = search_service.search_incidents("celular")
+    assert result["total"] == 1
+    assert result["results"][0]["id"] == "1"